@@ -0,0 +1,90 @@
+"""
+Порівнює розмір і час кодування тіла submit_result у різних форматах
+на синтетичних партіях результатів prom_pars.
+
+    python -m bench.payload_bench [--sizes 100 500 2000] [--output payload.json]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from payload_codec import compress, to_columnar, zstandard
+
+# Скільки разів повторювати кодування для усереднення часу
+REPEATS = 20
+
+
+def make_batch(size: int, seed: int = 42) -> list:
+    """Партія daily_data з розподілом значень, близьким до реального каталогу."""
+    rng = random.Random(seed)
+    return [
+        {
+            "product_id": 1_000_000 + rng.randrange(9_000_000),
+            "status_id": rng.choices([0, 1, 2, 3, 4, 5], [5, 60, 15, 10, 5, 5])[0],
+            "price": round(rng.uniform(20, 20000), rng.choice([0, 2])),
+            "order_quantity": rng.choice([None, None, 0, rng.randrange(1, 5000)]),
+            "rating": rng.choice([None, round(rng.uniform(3, 5), 1)]),
+        }
+        for _ in range(size)
+    ]
+
+
+def _json(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _variants() -> dict:
+    """Формати: функція payload -> bytes."""
+    variants = {
+        "json (legacy)": lambda p: json.dumps(p).encode(),
+        "json+gzip": lambda p: compress(_json(p), "gzip"),
+        "columnar": lambda p: _json(dict(p, result=to_columnar(p["result"]))),
+        "columnar+gzip": lambda p: compress(
+            _json(dict(p, result=to_columnar(p["result"]))), "gzip"
+        ),
+    }
+    if zstandard is not None:
+        variants["columnar+zstd"] = lambda p: compress(
+            _json(dict(p, result=to_columnar(p["result"]))), "zstd"
+        )
+    return variants
+
+
+def run(sizes: list) -> dict:
+    report = {}
+    for size in sizes:
+        payload = {
+            "task_id": 1,
+            "worker_id": "bench",
+            "status": "success",
+            "result": make_batch(size),
+        }
+        baseline = None
+        report[size] = {}
+        for name, encode in _variants().items():
+            started = time.perf_counter()
+            for _ in range(REPEATS):
+                body = encode(payload)
+            elapsed_ms = 1000 * (time.perf_counter() - started) / REPEATS
+            baseline = baseline or len(body)
+            report[size][name] = {
+                "bytes": len(body),
+                "ratio": round(len(body) / baseline, 3),
+                "encode_ms": round(elapsed_ms, 2),
+            }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 500, 2000])
+    parser.add_argument("--output", help="зберегти результат у JSON-файл")
+    args = parser.parse_args()
+
+    result = run(args.sizes)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,203 @@
+"""
+Локальні замінники зовнішніх сервісів для бенчмарків:
+FixtureSite - сайт зі збереженими сторінками товарів prom,
+TaskServer - сервер завдань з /get_task, /submit_chunk і /submit_result.
+"""
+
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Види сторінок: шаблон і HTTP-код відповіді
+PAGE_KINDS = {
+    "in_stock": ("in_stock.html", 200),
+    "slow": ("in_stock.html", 200),
+    "deleted": ("deleted.html", 200),
+    "not_found": ("not_found.html", 404),
+    "captcha": ("captcha.html", 200),
+}
+# Частка кожного виду сторінок у згенерованому каталозі за замовчуванням
+DEFAULT_MIX = {
+    "in_stock": 0.75,
+    "slow": 0.05,
+    "deleted": 0.1,
+    "not_found": 0.08,
+    "captcha": 0.02,
+}
+# Затримка відповіді "повільних" сторінок у секундах
+SLOW_DELAY = 2.0
+
+
+def _serve(handler_class) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class FixtureSite:
+    """
+    Віддає сторінки товарів за адресою /p/<вид>/<product_id>.
+    Ціна, кількість замовлень і рейтинг детерміновано залежать від product_id.
+    """
+
+    def __init__(self, slow_delay: float = SLOW_DELAY):
+        self.slow_delay = slow_delay
+        self.templates = {}
+        for kind, (file_name, _) in PAGE_KINDS.items():
+            with open(os.path.join(FIXTURES_DIR, file_name), encoding="utf-8") as f:
+                self.templates[kind] = f.read()
+        self.requests = 0
+        self._server = None
+
+    def start(self) -> "FixtureSite":
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests += 1
+                parts = self.path.strip("/").split("/")
+                if len(parts) != 3 or parts[0] != "p" or parts[1] not in PAGE_KINDS:
+                    self.send_error(404)
+                    return
+                kind, product_id = parts[1], int(parts[2])
+                if kind == "slow":
+                    time.sleep(site.slow_delay)
+                body = site.render(kind, product_id).encode("utf-8")
+                self.send_response(PAGE_KINDS[kind][1])
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _serve(Handler)
+        return self
+
+    def render(self, kind: str, product_id: int) -> str:
+        rng = random.Random(product_id)
+        return (
+            self.templates[kind]
+            .replace("{product_id}", str(product_id))
+            .replace("{price}", f"{rng.randrange(20, 20000)}.00")
+            .replace("{orders}", str(rng.randrange(0, 5000)))
+            .replace("{rating}", f"{rng.uniform(3, 5):.1f}")
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def catalog(self, count: int, mix: dict = None, seed: int = 42) -> list:
+        """Список products_to_scrape з потрібною часткою кожного виду сторінок."""
+        mix = mix or DEFAULT_MIX
+        rng = random.Random(seed)
+        kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+        return [
+            {"product_id": 1_000_000 + i, "url": f"{self.url}/p/{kind}/{1_000_000 + i}"}
+            for i, kind in enumerate(kinds)
+        ]
+
+    def stop(self):
+        self._server.shutdown()
+
+
+class TaskServer:
+    """
+    Сервер завдань: віддає завдання з черги і записує, коли кожне завдання
+    було видано і коли надійшов його результат.
+    """
+
+    def __init__(self, tasks: list):
+        self._tasks = list(tasks)
+        self._lock = threading.Lock()
+        self.issued_at = {}
+        self.submitted_at = {}
+        self.results = {}
+        self.items = {}
+        self.all_submitted = threading.Event()
+        # Коли воркер уперше звернувся по завдання
+        self.first_poll_at = None
+        self.polled = threading.Event()
+        self._expected = len(self._tasks)
+        self._server = None
+
+    def start(self) -> "TaskServer":
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, body: dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _read_json(self) -> dict:
+                data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    data = gzip.decompress(data)
+                return json.loads(data)
+
+            def do_GET(self):
+                if self.path.split("?")[0].endswith("/get_task"):
+                    self._reply(stand_in._next_task())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                path = self.path.split("?")[0]
+                if path.endswith("/submit_chunk"):
+                    stand_in._record_chunk(self._read_json())
+                elif path.endswith("/submit_result"):
+                    stand_in._record_result(self._read_json())
+                else:
+                    self.send_error(404)
+                    return
+                self._reply({"status": "ok"})
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _serve(Handler)
+        return self
+
+    def _next_task(self) -> dict:
+        with self._lock:
+            if self.first_poll_at is None:
+                self.first_poll_at = time.monotonic()
+                self.polled.set()
+            if not self._tasks:
+                return {"status": "no_tasks"}
+            task = self._tasks.pop(0)
+            self.issued_at[task["id"]] = time.monotonic()
+            return task
+
+    def _record_chunk(self, payload: dict):
+        with self._lock:
+            self.items.setdefault(payload["task_id"], []).extend(payload["items"])
+
+    def _record_result(self, payload: dict):
+        with self._lock:
+            task_id = payload["task_id"]
+            self.submitted_at[task_id] = time.monotonic()
+            self.results[task_id] = payload
+            if isinstance(payload.get("result"), list):
+                self.items.setdefault(task_id, []).extend(payload["result"])
+            if len(self.results) >= self._expected:
+                self.all_submitted.set()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/api"
+
+    def stop(self):
+        self._server.shutdown()
@@ -0,0 +1,96 @@
+"""
+Вимірює час від запуску процесу воркера до першого звернення /get_task
+з відкладеним імпортом завдань і з імпортом усіх завдань при старті
+(як було, коли config.py імпортував модулі завдань напряму).
+
+    python -m bench.startup_bench [--runs 5] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.stand_in import TaskServer
+from process_tree import kill_process_tree
+
+# Скільки секунд чекати на перше звернення воркера
+FIRST_POLL_TIMEOUT = 60
+
+# Процес воркера: файли воркера - у тимчасовій папці, сервер - замінник
+CHILD_SCRIPT = """
+import multiprocessing
+import sys
+# Процеси завдань запускаються справжнім Python, а не підмінним шляхом
+multiprocessing.set_executable(sys.executable)
+sys.executable = {executable!r}
+import main
+main.SERVER_URL = {server_url!r}
+main.METRICS_PORT = 0
+main.TASK_LONG_POLL = 0
+if {eager!r}:
+    from task_registry import TaskRegistry
+
+    TaskRegistry(main.TASK_REGISTRY).preload()
+main.main_loop()
+"""
+
+
+def time_to_first_poll(eager: bool, executable: str) -> float:
+    server = TaskServer([]).start()
+    script = CHILD_SCRIPT.format(
+        executable=executable, server_url=server.url, eager=eager
+    )
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not server.polled.wait(FIRST_POLL_TIMEOUT):
+            raise RuntimeError("Воркер не звернувся до сервера завдань")
+        return server.first_poll_at - started
+    finally:
+        # Разом з воркером завершуємо і його процеси завдань
+        kill_process_tree(process.pid)
+        process.wait()
+        server.stop()
+
+
+def run(runs: int) -> dict:
+    executable = os.path.join(tempfile.mkdtemp(prefix="hive_bench_"), "worker.exe")
+    report = {}
+    for mode, eager in (("lazy", False), ("eager", True)):
+        # Перший запуск прогріває файловий кеш ОС і не враховується
+        time_to_first_poll(eager, executable)
+        samples = [time_to_first_poll(eager, executable) for _ in range(runs)]
+        report[mode] = {
+            "median_ms": round(1000 * statistics.median(samples), 1),
+            "min_ms": round(1000 * min(samples), 1),
+            "max_ms": round(1000 * max(samples), 1),
+        }
+    report["saved_ms"] = round(
+        report["eager"]["median_ms"] - report["lazy"]["median_ms"], 1
+    )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="зберегти результат у JSON-файл")
+    args = parser.parse_args()
+
+    result = run(args.runs)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,216 @@
+"""
+Відтворюваний офлайн-бенчмарк prom_pars і головного циклу воркера на
+локальних замінниках сайту і сервера завдань (bench/stand_in.py).
+
+    python -m bench.worker_bench [--products 200] [--tasks 3] [--concurrency 4]
+                                 [--mix in_stock=0.8 deleted=0.1 not_found=0.1]
+                                 [--skip-loop] [--output bench_result.json]
+
+Етап "parse" викликає iter_product_data напряму і вимірює товари/с,
+p50/p95 часу одного товару. Етап "loop" запускає main_loop з одним слотом
+проти сервера завдань і рахує накладні витрати циклу на завдання:
+(час від першого /get_task до останнього /submit_result - час роботи завдань) / завдань.
+Сторінки з капчею і всі сторінки, які не вдалося розібрати через HTTP,
+відкриваються в браузері, тож для них потрібен Chrome.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+import metrics
+from bench.stand_in import DEFAULT_MIX, SLOW_DELAY, FixtureSite, TaskServer
+
+# Як часто (с) заміряти пам'ять процесу і його дочірніх процесів (Chrome)
+RSS_SAMPLE_INTERVAL = 0.2
+# Скільки секунд чекати на всі результати етапу "loop"
+LOOP_TIMEOUT = 600
+
+
+class PeakRss:
+    """Фоновий замір найбільшої сумарної пам'яті процесу і його дочірніх процесів."""
+
+    def __init__(self):
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> float:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self._sample())
+            self._stop.wait(RSS_SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def bench_parse(site: FixtureSite, products: int, concurrency: int, mix: dict) -> dict:
+    from tasks.prom_parser import iter_product_data
+
+    catalog = site.catalog(products, mix)
+    with PeakRss() as rss, metrics.task_scope() as task_metrics:
+        started = time.perf_counter()
+        # Капча не проходиться вручну, щоб замір не чекав на людину
+        data = list(
+            iter_product_data(
+                catalog,
+                concurrency=concurrency,
+                request_interval=0,
+                use_cache=False,
+                captcha_mode="defer",
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+    latencies = task_metrics.samples("product_seconds")
+    statuses = {}
+    for item in data:
+        statuses[item["status_id"]] = statuses.get(item["status_id"], 0) + 1
+    return {
+        "products": len(data),
+        "seconds": round(elapsed, 3),
+        "products_per_sec": round(len(data) / elapsed, 2),
+        "latency_p50_ms": round(1000 * _percentile(latencies, 0.5), 1),
+        "latency_p95_ms": round(1000 * _percentile(latencies, 0.95), 1),
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "status_counts": {str(k): v for k, v in sorted(statuses.items())},
+        "counters": task_metrics.compact()["counters"],
+    }
+
+
+def bench_loop(site: FixtureSite, tasks: int, products: int, mix: dict) -> dict:
+    import main
+
+    task_list = [
+        {
+            "id": f"bench-{i}",
+            "task_type": "prom_pars",
+            "params": {
+                "products_to_scrape": site.catalog(products, mix, seed=i),
+                "request_interval": 0,
+                "use_cache": False,
+                "captcha_mode": "defer",
+            },
+        }
+        for i in range(tasks)
+    ]
+    server = TaskServer(task_list).start()
+
+    # Воркер працює проти замінника сервера з одним слотом і без сторінки метрик
+    main.SERVER_URL = server.url
+    main.TASK_SLOTS = 1
+    main.METRICS_PORT = 0
+    main.TASK_LONG_POLL = 0
+    main.NO_TASK_SLEEP_MIN = 0.1
+
+    with PeakRss() as rss:
+        threading.Thread(target=main.main_loop, daemon=True).start()
+        finished = server.all_submitted.wait(LOOP_TIMEOUT)
+
+    if not finished:
+        raise RuntimeError(
+            f"Воркер не відправив усі результати за {LOOP_TIMEOUT} с "
+            f"({len(server.results)} з {tasks})"
+        )
+
+    wall = max(server.submitted_at.values()) - min(server.issued_at.values())
+    run_seconds = [
+        server.results[task["id"]].get("metrics", {}).get("run_seconds", 0)
+        for task in task_list
+    ]
+    items = sum(len(server.items.get(task["id"], [])) for task in task_list)
+    return {
+        "tasks": tasks,
+        "products_per_task": products,
+        "items_received": items,
+        "seconds": round(wall, 3),
+        "products_per_sec": round(items / wall, 2),
+        "task_run_seconds_p50": round(_percentile(run_seconds, 0.5), 3),
+        "loop_overhead_per_task_ms": round(1000 * (wall - sum(run_seconds)) / tasks, 1),
+        "peak_rss_mb": round(rss.peak_mb, 1),
+    }
+
+
+def run(args) -> dict:
+    from config import WORKER_VERSION
+
+    mix = {k: float(v) for k, v in (item.split("=") for item in args.mix)} or None
+    site = FixtureSite(slow_delay=args.slow_delay).start()
+    report = {
+        "worker_version": WORKER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {
+            "products": args.products,
+            "tasks": args.tasks,
+            "concurrency": args.concurrency,
+            "mix": mix or DEFAULT_MIX,
+            "slow_delay": args.slow_delay,
+        },
+    }
+    try:
+        report["parse"] = bench_parse(site, args.products, args.concurrency, mix)
+        if not args.skip_loop:
+            report["loop"] = bench_loop(site, args.tasks, args.products, mix)
+    finally:
+        site.stop()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--mix", nargs="*", default=[], help="частки видів сторінок, вид=частка"
+    )
+    parser.add_argument("--slow-delay", type=float, default=SLOW_DELAY)
+    parser.add_argument("--skip-loop", action="store_true")
+    parser.add_argument("--output", help="зберегти результат у JSON-файл")
+    args = parser.parse_args()
+
+    # Файли воркера (ID, spool, кеші) створюються поруч з sys.executable -
+    # переносимо їх у тимчасову папку, щоб не зачепити справжні
+    # (процеси завдань при цьому запускаються справжнім Python)
+    multiprocessing.set_executable(sys.executable)
+    sys.executable = os.path.join(tempfile.mkdtemp(prefix="hive_bench_"), "worker.exe")
+
+    result = run(args)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,54 @@
+import json
+import os
+
+
+class CheckpointStore:
+    """
+    Зберігає на диску прогрес потокових завдань: саме завдання і кількість
+    елементів результату, які сервер уже підтвердив. Після перезапуску
+    воркер продовжує такі завдання з останнього підтвердженого елемента.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, task_id) -> str:
+        return os.path.join(self.directory, f"{task_id}.json")
+
+    def save(self, task: dict, acked: int):
+        """Атомарно записує прогрес завдання."""
+        path = self._path(task.get("id"))
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"task": task, "acked": acked}, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def load(self, task_id) -> int:
+        """Повертає кількість підтверджених елементів (0, якщо прогресу немає)."""
+        try:
+            with open(self._path(task_id), "r", encoding="utf-8") as f:
+                return int(json.load(f).get("acked", 0))
+        except (IOError, ValueError):
+            return 0
+
+    def pending(self) -> list:
+        """Повертає завдання, які не було завершено до зупинки воркера."""
+        tasks = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(
+                    os.path.join(self.directory, name), "r", encoding="utf-8"
+                ) as f:
+                    tasks.append(json.load(f)["task"])
+            except (IOError, ValueError, KeyError):
+                pass
+        return tasks
+
+    def remove(self, task_id):
+        try:
+            os.remove(self._path(task_id))
+        except OSError:
+            pass
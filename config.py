@@ -3,19 +3,73 @@ WORKER_VERSION = "1.0.9"
 # URL сервера, до якого підключається воркер
 SERVER_URL = "http://45.66.10.118:3010/api"
 
-# Час очікування в секундах, якщо немає завдань
+# Час очікування в секундах, якщо немає завдань (затримка росте
+# експоненційно від NO_TASK_SLEEP_MIN до NO_TASK_SLEEP)
+NO_TASK_SLEEP_MIN = 5
 NO_TASK_SLEEP = 180
-# Час очікування в секундах при помилці з'єднання
+# Час очікування в секундах при помилці з'єднання (затримка росте
+# експоненційно від TIME_ERROR_SLEEP_MIN до TIME_ERROR_SLEEP)
+TIME_ERROR_SLEEP_MIN = 5
 TIME_ERROR_SLEEP = 180
 # Час очікування в секундах при помилці завдання
 TASK_ERROR_SLEEP = 1800
 # Час очікування в секундах при помилці оновлення
 UPDATE_ERROR_SLEEP = 1800
 
+# --- КОНВЕЄР ЗАВДАНЬ ---
+# Скільки завдань воркер забирає наперед, поки виконує поточне
+TASK_QUEUE_DEPTH = 1
+# Скільки секунд сервер може тримати запит /get_task, чекаючи на завдання (0 - вимкнено)
+TASK_LONG_POLL = 30
+# Файл поруч з воркером, у якому результати чекають на підтвердження сервером
+RESULT_SPOOL_FILE = "results_spool.db"
+# Скільки непідтверджених результатів відправляти за один прохід
+RESULT_SPOOL_BATCH = 20
+# Скільки секунд перед оновленням чекати на відправку результатів
+UPDATE_FLUSH_TIMEOUT = 60
 
-# --- РЕЄСТР ЗАВДАНЬ ---
-from tasks.prom_parser import parse_product_data
+# --- ПОТОКОВА ВІДПРАВКА РЕЗУЛЬТАТІВ ---
+# Скільки елементів результату відправляти однією частиною
+STREAM_CHUNK_SIZE = 50
+# Максимальний інтервал у секундах між відправками частин
+STREAM_CHUNK_INTERVAL = 60
+# Папка поруч з воркером для збереження прогресу незавершених завдань
+CHECKPOINT_DIR = "checkpoints"
+
+# --- ОРЕНДА ЗАВДАНЬ ---
+# Як часто (с) продовжувати оренду завдань, що виконуються, і звітувати про прогрес (0 - вимкнено)
+HEARTBEAT_INTERVAL = 15
+
+# --- СЛОТИ ВИКОНАННЯ ---
+# Скільки завдань воркер виконує одночасно (0 - визначити автоматично за CPU/RAM)
+TASK_SLOTS = 0
+# Скільки вільної пам'яті в МБ потрібно на один слот при автоматичному визначенні
+TASK_SLOT_RAM_MB = 1024
+# Виконувати завдання в окремих процесах (по одному на слот) з лімітами часу і пам'яті
+TASK_ISOLATION = True
+# Максимальний час виконання одного завдання в секундах
+TASK_TIMEOUT = 4 * 3600
+# Ліміт пам'яті процесу завдання разом з його браузерами в МБ
+TASK_MAX_RSS_MB = 4096
+
+# --- ПУЛ БРАУЗЕРІВ ---
+# Скільки браузерів воркер тримає запущеними між завданнями
+BROWSER_POOL_SIZE = 2
+# Після скількох сторінок браузер перезапускається
+BROWSER_MAX_PAGES = 200
+# Поріг пам'яті одного браузера в МБ, після якого він перезапускається
+BROWSER_MAX_RSS_MB = 1500
 
+# --- МЕТРИКИ ---
+# Порт локальної сторінки http://127.0.0.1:<порт>/metrics (0 - вимкнено)
+METRICS_PORT = 9310
+# Додавати короткий підсумок метрик завдання до кожного submit_result
+METRICS_IN_RESULT = True
+
+
+# --- РЕЄСТР ЗАВДАНЬ ---
+# Назва завдання -> "модуль:функція". Модуль імпортується лише при першому
+# завданні цього типу. Завдання, яких тут немає, шукаються в tasks/<назва>.py (функція run)
 TASK_REGISTRY = {
-    "prom_pars": parse_product_data,
+    "prom_pars": "tasks.prom_parser:iter_product_data",
 }
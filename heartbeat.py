@@ -0,0 +1,165 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+import metrics
+
+
+def _input_size(params: dict) -> int | None:
+    """Розмір вхідного списку завдання (перший параметр-список), якщо він є."""
+    for value in params.values():
+        if isinstance(value, list):
+            return len(value)
+    return None
+
+
+class TaskLease:
+    """
+    Оренда завдання, яку HeartbeatSender продовжує на сервері, поки
+    завдання виконується. Зберігає прогрес (скільки елементів готово)
+    і сигнали сервера: cancel - зупинити завдання, shrink - обробити
+    лише перші total елементів (решту сервер уже віддав іншому воркеру).
+    """
+
+    def __init__(self, task: dict):
+        self.task_id = task.get("id")
+        self.total = _input_size(task.get("params", {}))
+        self.done = 0
+        self.limit = None
+        self.cancelled = threading.Event()
+        self._started = time.monotonic()
+        self._start_done = 0
+
+    def resume(self, done: int):
+        """Прогрес, досягнутий до перезапуску воркера (у швидкість не враховується)."""
+        self.done = self._start_done = done
+
+    def progress(self, count: int = 1):
+        self.done += count
+
+    def should_stop(self) -> bool:
+        """Чи треба зупинити завдання за сигналом сервера."""
+        return self.cancelled.is_set() or (
+            self.limit is not None and self.done >= self.limit
+        )
+
+    def report(self) -> dict:
+        elapsed = time.monotonic() - self._started
+        done = self.done - self._start_done
+        return {
+            "task_id": self.task_id,
+            "done": self.done,
+            "total": self.total,
+            "rate": round(done / elapsed, 3) if elapsed > 0 else 0.0,
+        }
+
+    def apply(self, signal: dict):
+        """Застосовує сигнал сервера з відповіді на heartbeat."""
+        action = signal.get("action")
+        if action == "cancel":
+            metrics.inc("tasks_cancelled_total")
+            self.cancelled.set()
+        elif action == "shrink":
+            try:
+                limit = int(signal["total"])
+            except (KeyError, TypeError, ValueError):
+                return
+            if self.limit is None or limit < self.limit:
+                metrics.inc("tasks_shrunk_total")
+                self.limit = limit
+                self.total = limit if self.total is None else min(self.total, limit)
+
+
+class HeartbeatSender:
+    """
+    Фоновий потік, що кожні interval секунд одним запитом /task_heartbeat
+    продовжує оренду всіх завдань, які зараз виконуються, і повідомляє
+    їхній прогрес. Так сервер не видає довге завдання повторно іншому
+    воркеру і швидко помічає завислі. Оренда завдань, отриманих наперед
+    і ще не розпочатих, продовжується тим самим запитом (список queued
+    з функції queued). У відповіді сервер може попросити
+    зупинити завдання: {"tasks": {"<task_id>": {"action": "cancel"}}} або
+    {"action": "shrink", "total": N}.
+
+    Якщо сервер не підтримує /task_heartbeat (404/405), heartbeat вимикається.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        server_url: str,
+        worker_id: str,
+        interval: float,
+        queued=None,
+    ):
+        self.session = session
+        self.server_url = server_url
+        self.worker_id = worker_id
+        self.interval = interval
+        self.queued = queued
+        self._leases = {}
+        self._lock = threading.Lock()
+        # Чи підтримує сервер /task_heartbeat (None - ще невідомо)
+        self._supported = None
+        self._thread = threading.Thread(
+            target=self._run, name="task_heartbeat", daemon=True
+        )
+
+    def start(self):
+        if self.interval:
+            self._thread.start()
+
+    @contextmanager
+    def lease(self, task: dict):
+        """Реєструє завдання на час виконання і повертає його TaskLease."""
+        lease = TaskLease(task)
+        with self._lock:
+            self._leases[id(lease)] = lease
+        try:
+            yield lease
+        finally:
+            with self._lock:
+                self._leases.pop(id(lease), None)
+
+    def beat(self):
+        """Відправляє один heartbeat для всіх завдань, що виконуються або чекають у черзі."""
+        with self._lock:
+            leases = list(self._leases.values())
+        queued = self.queued() if self.queued else []
+        if (not leases and not queued) or self._supported is False:
+            return
+
+        payload = {
+            "worker_id": self.worker_id,
+            "tasks": [lease.report() for lease in leases],
+            "queued": queued,
+        }
+        try:
+            response = self.session.post(
+                f"{self.server_url}/task_heartbeat", json=payload, timeout=30
+            )
+            if response.status_code in (404, 405):
+                # Старий сервер - оренду не продовжуємо
+                self._supported = False
+                return
+            response.raise_for_status()
+            signals = response.json().get("tasks") or {}
+        except (requests.exceptions.RequestException, ValueError, AttributeError):
+            metrics.inc("heartbeat_errors_total")
+            return
+
+        self._supported = True
+        metrics.inc("heartbeats_total")
+        if not isinstance(signals, dict):
+            return
+        for lease in leases:
+            signal = signals.get(str(lease.task_id))
+            if isinstance(signal, dict):
+                lease.apply(signal)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.beat()
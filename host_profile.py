@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import psutil
+
+import metrics
+from process_tree import process_tree
+
+# Заголовок /get_task зі знімком можливостей і навантаження машини (JSON)
+HOST_HEADER = "X-Worker-Host"
+# Скільки секунд знімок вважається свіжим (між опитуваннями він не перераховується)
+SNAPSHOT_TTL = 15
+# За скільки останніх секунд рахуються швидкість обробки і частка капчі
+RATE_WINDOW = 600
+
+
+class HostSnapshot:
+    """
+    Дешевий кешований знімок машини для планувальника на сервері:
+    ядра і пам'ять, поточне навантаження (окремо - від самого воркера і від
+    решти програм користувача), швидкість обробки товарів і частка капчі.
+    """
+
+    def __init__(self, ttl: float = SNAPSHOT_TTL, window: float = RATE_WINDOW):
+        self.ttl = ttl
+        self.window = window
+        self._static = {
+            "cpu_logical": psutil.cpu_count() or os.cpu_count() or 1,
+            "cpu_physical": psutil.cpu_count(logical=False) or os.cpu_count() or 1,
+            "ram_total_mb": round(psutil.virtual_memory().total / (1024 * 1024)),
+        }
+        self._history = deque()
+        self._worker_cpu = None
+        self._cached = None
+        self._cached_at = 0.0
+        self._lock = threading.Lock()
+        # Перший виклик лише починає вимір завантаження CPU
+        psutil.cpu_percent(interval=None)
+
+    def get(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            if self._cached is None or now - self._cached_at >= self.ttl:
+                self._cached = self._collect(now)
+                self._cached_at = now
+            return self._cached
+
+    def header(self) -> dict:
+        return {HOST_HEADER: json.dumps(self.get(), separators=(",", ":"))}
+
+    def _collect(self, now: float) -> dict:
+        cpu_percent = psutil.cpu_percent(interval=None)
+        worker_percent = self._worker_cpu_percent(now)
+        snapshot = dict(
+            self._static,
+            ram_free_mb=round(psutil.virtual_memory().available / (1024 * 1024)),
+            cpu_percent=round(cpu_percent, 1),
+            worker_cpu_percent=round(worker_percent, 1),
+            # Навантаження від програм користувача, а не від воркера і його браузерів
+            other_cpu_percent=round(max(0.0, cpu_percent - worker_percent), 1),
+        )
+        snapshot.update(self._rates(now))
+        return snapshot
+
+    def _worker_cpu_percent(self, now: float) -> float:
+        """Частка CPU машини, яку за час з попереднього знімка зайняли воркер і його нащадки."""
+        cpu_seconds = 0.0
+        for proc in process_tree(os.getpid()):
+            try:
+                times = proc.cpu_times()
+                cpu_seconds += times.user + times.system
+            except psutil.Error:
+                pass
+        previous, self._worker_cpu = self._worker_cpu, (now, cpu_seconds)
+        if previous is None or now <= previous[0]:
+            return 0.0
+        # Завершені дочірні процеси "забирають" свій час - тоді різниця від'ємна
+        used = max(0.0, cpu_seconds - previous[1])
+        return min(
+            100.0, 100 * used / (now - previous[0]) / self._static["cpu_logical"]
+        )
+
+    def _rates(self, now: float) -> dict:
+        registry = metrics.REGISTRY
+        self._history.append(
+            (
+                now,
+                registry.counter("task_items_total"),
+                registry.counter("products_total"),
+                registry.counter("captcha_total"),
+            )
+        )
+        while now - self._history[0][0] > self.window and len(self._history) > 2:
+            self._history.popleft()
+
+        first, last = self._history[0], self._history[-1]
+        elapsed = last[0] - first[0]
+        products = last[2] - first[2]
+        return {
+            "items_per_sec": (
+                round((last[1] - first[1]) / elapsed, 2) if elapsed > 0 else None
+            ),
+            "captcha_rate": (
+                round((last[3] - first[3]) / products, 3) if products > 0 else None
+            ),
+        }
@@ -0,0 +1,317 @@
+import inspect
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+from process_tree import kill_process_tree, tree_rss_mb
+from streaming import drain
+from task_registry import TaskRegistry
+
+# Як часто (с) перевіряти тайм-аут і пам'ять процесу завдання
+MONITOR_INTERVAL = 1.0
+# Скільки секунд чекати на відповідь процесу на службовий запит
+INSPECT_TIMEOUT = 120
+# Скільки секунд чекати на коректне завершення процесу при зупинці
+STOP_TIMEOUT = 10
+
+
+class TaskLimitExceeded(RuntimeError):
+    """Процес завдання перевищив ліміт часу або пам'яті і був зупинений."""
+
+
+class TaskCancelled(RuntimeError):
+    """Завдання скасовано сервером, і процес завдання було зупинено."""
+
+
+def _start_browsers(size: int, max_pages: int, max_rss_mb: float):
+    from tasks.browser_pool import start_browser_pool
+
+    start_browser_pool(size, max_pages, max_rss_mb)
+
+
+def _stop_browsers():
+    # Пул існує лише якщо модуль уже імпортовано
+    if "tasks.browser_pool" in sys.modules:
+        sys.modules["tasks.browser_pool"].shutdown_browser_pool()
+
+
+def _child_main(conn, entries: dict, browser_pool: tuple | None):
+    """
+    Головний цикл процесу завдань. Модулі завдань і пул браузерів
+    прогріваються одразу після запуску, ще до першого завдання.
+    Запити: ("inspect", назва) | ("run", назва, params) | ("stop",).
+    Відповіді: ("kind", чи потокове) | ("item", елемент) |
+    ("done", результат, метрики) | ("error", повідомлення, метрики).
+    """
+    tasks = TaskRegistry(entries)
+    if browser_pool:
+        threading.Thread(target=_start_browsers, args=browser_pool, daemon=True).start()
+    try:
+        tasks.preload()
+    except Exception:
+        pass  # Помилку імпорту буде повідомлено з першим завданням цього типу
+
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == "stop":
+                break
+            if message[0] == "inspect":
+                task_fn = tasks.get(message[1])
+                conn.send(("kind", inspect.isgeneratorfunction(task_fn)))
+                continue
+
+            _, task_name, params = message
+            with metrics.task_scope() as task_metrics:
+                try:
+                    task_fn = tasks.resolve(task_name)
+                    if inspect.isgeneratorfunction(task_fn):
+                        # Результат завдання-генератора - параметри його продовження
+                        result = drain(
+                            task_fn(**params), lambda item: conn.send(("item", item))
+                        )
+                    else:
+                        result = task_fn(**params)
+                    reply = ("done", result)
+                except Exception as e:
+                    reply = ("error", str(e))
+            conn.send(reply + (task_metrics.export(),))
+    except (EOFError, OSError, KeyboardInterrupt):
+        pass  # Воркер завершився - завершуємося і ми
+    finally:
+        _stop_browsers()
+
+
+class TaskProcess:
+    """
+    Окремий "теплий" процес, у якому виконуються завдання одного слоту.
+    Процес живе між завданнями (модулі та браузери лишаються завантаженими),
+    а воркер стежить за ним: при перевищенні timeout секунд на завдання
+    або max_rss_mb пам'яті (разом з Chrome) дерево процесу завершується,
+    а на заміну одразу запускається новий процес.
+    """
+
+    def __init__(
+        self,
+        entries: dict,
+        timeout: float,
+        max_rss_mb: float,
+        browser_pool: tuple = None,
+    ):
+        self.entries = entries
+        self.timeout = timeout
+        self.max_rss_mb = max_rss_mb
+        self.browser_pool = browser_pool
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._conn = None
+        self._kinds = {}
+        # Коли востаннє перевірялася пам'ять процесу
+        self._rss_checked_at = 0.0
+
+    def start(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(
+            target=_child_main,
+            args=(child_conn, self.entries, self.browser_pool),
+            name="task_process",
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+    def close(self):
+        """Зупиняє процес; якщо він не завершився сам, завершує все його дерево."""
+        if self._process is None:
+            return
+        try:
+            self._conn.send(("stop",))
+            self._process.join(STOP_TIMEOUT)
+        except (OSError, ValueError):
+            pass
+        if self._process.is_alive():
+            kill_process_tree(self._process.pid)
+        self._conn.close()
+        self._process = None
+
+    def restart(self):
+        """Негайно завершує дерево процесу і запускає новий процес."""
+        if self._process is not None:
+            kill_process_tree(self._process.pid)
+            self._conn.close()
+            self._process = None
+        self.start()
+
+    def is_streaming(self, task_name: str) -> bool:
+        """Чи є завдання генератором (результат віддається частинами)."""
+        if task_name not in self._kinds:
+            try:
+                self.start()
+                self._conn.send(("inspect", task_name))
+                _, streaming = self._receive(time.monotonic() + INSPECT_TIMEOUT)
+            except (RuntimeError, OSError):
+                # Помилку буде повідомлено, коли завдання спробують виконати
+                self.restart()
+                return False
+            self._kinds[task_name] = streaming
+        return self._kinds[task_name]
+
+    def call(self, task_name: str, params: dict, cancel: threading.Event = None):
+        """
+        Виконує звичайне завдання і повертає його результат. Коли встановлено
+        cancel, процес завдання зупиняється, не чекаючи на результат.
+        """
+        for message in self._run(task_name, params, cancel):
+            if message[0] == "done":
+                return message[1]
+        raise RuntimeError("Процес завдання не повернув результат")
+
+    def iterate(self, task_name: str, params: dict, cancel: threading.Event = None):
+        """
+        Виконує завдання-генератор, віддаючи його елементи по мірі надходження;
+        повертає (return) те, що повернуло завдання.
+        """
+        for message in self._run(task_name, params, cancel):
+            if message[0] == "item":
+                yield message[1]
+            else:
+                return message[1]
+
+    def _run(self, task_name: str, params: dict, cancel: threading.Event = None):
+        self.start()
+        deadline = time.monotonic() + self.timeout
+        self._conn.send(("run", task_name, params))
+        finished = False
+        try:
+            while True:
+                message = self._receive(deadline, cancel)
+                if message[0] == "item":
+                    yield message
+                    continue
+                finished = True
+                metrics.merge(message[2])
+                if message[0] == "error":
+                    raise RuntimeError(message[1])
+                yield message
+                return
+        finally:
+            if not finished:
+                # Завдання перервано посередині - стан процесу невідомий
+                self.restart()
+            elif tree_rss_mb(self._process.pid) > self.max_rss_mb:
+                # Процес "розпух" - перезапускаємо його до наступного завдання
+                metrics.inc("task_process_restarts_total")
+                self.restart()
+
+    def _receive(self, deadline: float, cancel: threading.Event = None):
+        """Чекає на повідомлення від процесу, стежачи за тайм-аутом, пам'яттю і скасуванням."""
+        while True:
+            # Ліміти перевіряються і тоді, коли завдання безперервно віддає елементи
+            self._check_limits(deadline, cancel)
+            try:
+                if self._conn.poll(MONITOR_INTERVAL):
+                    return self._conn.recv()
+            except (EOFError, OSError):
+                metrics.inc("task_process_crashes_total")
+                raise RuntimeError("Процес завдання аварійно завершився")
+
+            if not self._process.is_alive():
+                metrics.inc("task_process_crashes_total")
+                raise RuntimeError(
+                    f"Процес завдання аварійно завершився (код {self._process.exitcode})"
+                )
+
+    def _check_limits(self, deadline: float, cancel: threading.Event = None):
+        if cancel is not None and cancel.is_set():
+            raise TaskCancelled("Завдання скасовано сервером")
+        now = time.monotonic()
+        if now > deadline:
+            metrics.inc("task_timeouts_total")
+            raise TaskLimitExceeded(f"Завдання перевищило ліміт часу {self.timeout} с")
+        # Обхід дерева процесів недешевий - не частіше ніж раз на MONITOR_INTERVAL
+        if now - self._rss_checked_at < MONITOR_INTERVAL:
+            return
+        self._rss_checked_at = now
+        rss_mb = tree_rss_mb(self._process.pid)
+        if rss_mb > self.max_rss_mb:
+            metrics.inc("task_memory_kills_total")
+            raise TaskLimitExceeded(
+                f"Завдання перевищило ліміт пам'яті: {rss_mb:.0f} МБ > {self.max_rss_mb} МБ"
+            )
+
+
+class InProcessRunner:
+    """Виконує завдання в процесі воркера (без ізоляції), з тим самим інтерфейсом, що й TaskProcess."""
+
+    def __init__(self, entries: dict, browser_pool: tuple = None):
+        self.tasks = TaskRegistry(entries)
+        self.browser_pool = browser_pool
+        self._browsers_started = None
+
+    def start(self):
+        # Пул браузерів запускається у фоні, щоб імпорт selenium не затримував старт воркера
+        if self.browser_pool and self._browsers_started is None:
+            self._browsers_started = threading.Thread(
+                target=_start_browsers,
+                args=self.browser_pool,
+                name="browser_pool_start",
+                daemon=True,
+            )
+            self._browsers_started.start()
+
+    def close(self):
+        if self._browsers_started is not None:
+            self._browsers_started.join()
+            self._browsers_started = None
+        _stop_browsers()
+
+    def is_streaming(self, task_name: str) -> bool:
+        return inspect.isgeneratorfunction(self.tasks.get(task_name))
+
+    # Завдання в процесі воркера не можна перервати посередині, тож cancel
+    # перевіряється лише між елементами завдання-генератора (див. drain)
+    def call(self, task_name: str, params: dict, cancel: threading.Event = None):
+        self._wait_browsers()
+        return self.tasks.resolve(task_name)(**params)
+
+    def iterate(self, task_name: str, params: dict, cancel: threading.Event = None):
+        self._wait_browsers()
+        return (yield from self.tasks.resolve(task_name)(**params))
+
+    def _wait_browsers(self):
+        # Завдання користуються пулом браузерів, тож він має бути створений
+        if self._browsers_started is not None:
+            self._browsers_started.join()
+
+
+class RunnerPool:
+    """Набір виконавців завдань, по одному на слот."""
+
+    def __init__(self, runners: list):
+        self.runners = runners
+        self._free = queue.Queue()
+        for runner in runners:
+            self._free.put(runner)
+
+    def start(self):
+        for runner in set(self.runners):
+            runner.start()
+
+    def close(self):
+        for runner in set(self.runners):
+            runner.close()
+
+    @contextmanager
+    def borrow(self):
+        runner = self._free.get()
+        try:
+            yield runner
+        finally:
+            self._free.put(runner)
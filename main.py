@@ -4,8 +4,7 @@ import uuid
 import subprocess
 import os
 import sys
-import zipfile
-import shutil
+import multiprocessing
 from typing import NoReturn
 
 from config import (
@@ -16,55 +15,63 @@ from config import (
     TASK_ERROR_SLEEP,
     TASK_REGISTRY,
     UPDATE_ERROR_SLEEP,
+    BROWSER_POOL_SIZE,
+    BROWSER_MAX_PAGES,
+    BROWSER_MAX_RSS_MB,
+    TASK_QUEUE_DEPTH,
+    TASK_LONG_POLL,
+    NO_TASK_SLEEP_MIN,
+    TIME_ERROR_SLEEP_MIN,
+    TASK_SLOTS,
+    TASK_SLOT_RAM_MB,
+    STREAM_CHUNK_SIZE,
+    STREAM_CHUNK_INTERVAL,
+    CHECKPOINT_DIR,
+    RESULT_SPOOL_FILE,
+    RESULT_SPOOL_BATCH,
+    UPDATE_FLUSH_TIMEOUT,
+    METRICS_PORT,
+    METRICS_IN_RESULT,
+    TASK_ISOLATION,
+    TASK_TIMEOUT,
+    TASK_MAX_RSS_MB,
+    HEARTBEAT_INTERVAL,
 )
-
-
-def handle_update(params: dict) -> NoReturn:
+import metrics
+from checkpoints import CheckpointStore
+from payload_codec import PayloadCodec
+from spool import ResultSpool
+from streaming import ChunkStreamer, drain
+from pipeline import Backoff, ResultSubmitter, TaskPrefetcher
+from slots import SlotExecutor, detect_slot_count
+from isolation import InProcessRunner, RunnerPool, TaskProcess
+from heartbeat import HeartbeatSender, TaskLease
+from host_profile import HostSnapshot
+from self_update import fetch_update
+
+
+def handle_update(params: dict, runners: RunnerPool) -> NoReturn:
     """
-    Обробляє завдання на оновлення, завантажуючи та розпаковуючи архів
-    в поточній папці воркера, щоб уникнути конфліктів з антивірусом.
+    Обробляє завдання на оновлення: завантажує новий worker.exe (з докачуванням
+    і перевіркою хешу) в поточну папку воркера, щоб уникнути конфліктів з антивірусом.
     """
     # Визначаємо шлях до папки, де запущено .exe файл
     exe_dir = os.path.dirname(sys.executable)
-
-    # Визначаємо шляхи для архіву та папки розпаковки всередині директорії воркера
-    zip_path = os.path.join(exe_dir, "update.zip")
-    extract_dir = os.path.join(exe_dir, "update_temp")
+    current_exe = sys.executable
+    update_exe_dest = current_exe.replace(".exe", "_update.exe")
 
     try:
-        url = params.get("url")
-        if not url:
-            raise ValueError("URL для оновлення не надано.")
-
-        # Завантаження архіву на пк
-        response = requests.get(url, stream=True, timeout=300)
-        response.raise_for_status()
-        with open(zip_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        # Розпаковка архіву в тимчасову папку
-        if not os.path.exists(extract_dir):
-            os.makedirs(extract_dir)
-        with zipfile.ZipFile(zip_path, "r") as zip_ref:
-            zip_ref.extractall(extract_dir)
-
-        # Перевірка чи в архіві є файл worker.exe
-        new_worker_path = os.path.join(extract_dir, "worker.exe")
-        if not os.path.exists(new_worker_path):
-            raise FileNotFoundError("worker.exe не знайдено в архіві.")
-
         # Перевірка чи в поточній директорії є файл updater.bat
         updater_bat = os.path.join(exe_dir, "updater.bat")
         if not os.path.exists(updater_bat):
             raise FileNotFoundError(f"Скрипт оновлення {updater_bat} не знайдено!")
 
-        # Переміщення worker.exe з архів в поточну директорію з приставкою _update
-        current_exe = sys.executable
-        update_exe_dest = current_exe.replace(".exe", "_update.exe")
-        shutil.move(new_worker_path, update_exe_dest)
+        # Новий worker.exe з приставкою _update; недокачані частини лишаються
+        # поруч з воркером і докачуються при наступній спробі
+        fetch_update(params, current_exe, WORKER_VERSION, update_exe_dest)
 
-        # Запуск скрипту оновлення і закриття поточного процесу
+        # Зупиняємо процеси завдань разом з браузерами, запускаємо скрипт оновлення і закриваємо поточний процес
+        runners.close()
         subprocess.Popen(
             [updater_bat, current_exe, update_exe_dest],
             creationflags=subprocess.CREATE_NEW_CONSOLE,
@@ -72,22 +79,13 @@ def handle_update(params: dict) -> NoReturn:
         sys.exit(0)
     except Exception as e:
         raise RuntimeError(f"Помилка під час оновлення воркера: {e}")
-    finally:
-        # Прибираємо за собою тимчасові файли (архів та папку)
-        if os.path.exists(zip_path):
-            os.remove(zip_path)
-        if os.path.exists(extract_dir):
-            shutil.rmtree(extract_dir, ignore_errors=True)
 
 
-def execute_regular_task(task_name: str, params: dict) -> list:
+def execute_regular_task(task_name: str, params: dict, runner, cancel=None) -> list:
     """Функція викликає функцію з реєстру завдань і повертає результат."""
     try:
-        if task_name not in TASK_REGISTRY:
-            raise ValueError(f"Завдання '{task_name}' не знайдено в реєстрі.")
-
         # Викликаємо таску, яка має повернути словник Python
-        data = TASK_REGISTRY[task_name](**params)
+        data = runner.call(task_name, params, cancel)
 
         # Перевіряємо статус всередині об'єкта
         if isinstance(data, dict) and data.get("status") == "success":
@@ -101,6 +99,161 @@ def execute_regular_task(task_name: str, params: dict) -> list:
         raise RuntimeError(f"Критична помилка під час виконання '{task_name}': {e}")
 
 
+def with_task_metrics(payload: dict) -> dict:
+    """Додає до результату короткий підсумок метрик поточного завдання."""
+    task_metrics = metrics.current_task_metrics()
+    if METRICS_IN_RESULT and task_metrics is not None:
+        payload["metrics"] = task_metrics.compact()
+    return payload
+
+
+def run_regular_task(
+    task: dict,
+    worker_id: str,
+    session,
+    submitter,
+    checkpoints: CheckpointStore,
+    codec: PayloadCodec,
+    runners: RunnerPool,
+    heartbeats: HeartbeatSender,
+) -> bool:
+    """
+    Виконує завдання у вільному виконавці з окремим набором метрик.
+    Поки завдання виконується, його оренда продовжується heartbeat-ами.
+    Повертає True, якщо завдання не завершилося помилкою (успішне або скасоване).
+    """
+    with metrics.task_scope(), runners.borrow() as runner:
+        with metrics.timer("task_run_seconds"), heartbeats.lease(task) as lease:
+            success = _run_task(
+                task, worker_id, session, submitter, checkpoints, codec, runner, lease
+            )
+        metrics.inc("tasks_total")
+        if not success:
+            metrics.inc("tasks_failed_total")
+    return success
+
+
+def _run_task(
+    task: dict,
+    worker_id: str,
+    session,
+    submitter,
+    checkpoints: CheckpointStore,
+    codec: PayloadCodec,
+    runner,
+    lease: TaskLease,
+) -> bool:
+    """
+    Виконує звичайне завдання і ставить результат (успішний або звіт
+    про помилку) в чергу на відправку. Повертає False лише при помилці.
+    """
+    # Завдання-генератори віддають результат частинами
+    if runner.is_streaming(task.get("task_type")):
+        return run_streaming_task(
+            task, worker_id, session, submitter, checkpoints, codec, runner, lease
+        )
+
+    result_data, status = None, "failure"
+    try:
+        # Викликаємо функцію для виконання завдання
+        result_data = execute_regular_task(
+            task.get("task_type"), task.get("params", {}), runner, lease.cancelled
+        )
+        status = "success"
+        if isinstance(result_data, list):
+            metrics.inc("task_items_total", len(result_data))
+
+    except Exception as e:
+        # Якщо сталася помилка, формуємо повідомлення про помилку для серверу
+        result_data = {"error": str(e)}
+        status = "cancelled" if lease.cancelled.is_set() else "failure"
+
+    # Відправляємо результат у фоні
+    submitter.submit(
+        with_task_metrics(
+            {
+                "task_id": task.get("id"),
+                "worker_id": worker_id,
+                "status": status,
+                "result": result_data,
+            }
+        )
+    )
+    # Скасоване сервером завдання - не помилка, слот не повинен "відпочивати"
+    return status != "failure"
+
+
+def run_streaming_task(
+    task: dict,
+    worker_id: str,
+    session,
+    submitter,
+    checkpoints: CheckpointStore,
+    codec: PayloadCodec,
+    runner,
+    lease: TaskLease,
+) -> bool:
+    """
+    Виконує завдання-генератор, відправляючи результати частинами.
+    Прогрес зберігається локально, тож після перезапуску завдання
+    продовжується з останнього підтвердженого сервером елемента
+    (функція завдання отримує його номер у параметрі resume_from).
+    За сигналом сервера в heartbeat (cancel/shrink) завдання зупиняється
+    після поточного елемента, а готові елементи відправляються як зазвичай.
+    """
+    task_id = task.get("id")
+    task_type = task.get("task_type")
+    resume_from = checkpoints.load(task_id)
+    checkpoints.save(task, resume_from)
+    lease.resume(resume_from)
+
+    streamer = ChunkStreamer(
+        session,
+        SERVER_URL,
+        worker_id,
+        task,
+        checkpoints,
+        acked=resume_from,
+        chunk_size=STREAM_CHUNK_SIZE,
+        interval=STREAM_CHUNK_INTERVAL,
+        codec=codec,
+    )
+    status, error, continuation = "success", None, None
+
+    def on_item(item):
+        # Лічильник у процесі воркера оновлюється одразу, а не після завершення завдання
+        metrics.inc("task_items_total")
+        lease.progress()
+        streamer.add(item)
+
+    try:
+        params = dict(task.get("params", {}), resume_from=resume_from)
+        continuation = drain(
+            runner.iterate(task_type, params, lease.cancelled),
+            on_item,
+            stop=lease.should_stop,
+        )
+    except Exception as e:
+        status = "failure"
+        error = f"Критична помилка під час виконання '{task_type}': {e}"
+    if lease.cancelled.is_set():
+        # Сервер уже не чекає на це завдання; підтверджені елементи лишаються за ним
+        status, error = "cancelled", None
+
+    # Досилаємо залишок; фінальний результат уже надійно лежить у spool, тож прогрес більше не потрібен
+    streamer.flush()
+    payload = streamer.final_payload(status, error)
+    if continuation:
+        # Необроблену частину сервер видає як нове завдання з цими параметрами
+        payload["continuation"] = {
+            "task_type": task_type,
+            "params": dict(task.get("params", {}), **continuation),
+        }
+    submitter.submit(with_task_metrics(payload))
+    checkpoints.remove(task_id)
+    return status != "failure"
+
+
 def _get_id_prefix(nickname_path: str, default: str = "worker") -> str:
     """Безпечно читає префікс з файлу, інакше повертає стандартний."""
     try:
@@ -182,35 +335,145 @@ def main_loop():
 
     # Налаштовуємо підключення до сервера
     HEADERS = {"X-Worker-ID": WORKER_ID, "X-Worker-Version": WORKER_VERSION}
+    # Одна keep-alive сесія на всі запити до сервера
     session = requests.Session()
     session.headers.update(HEADERS)
+    # Формат результатів узгоджується з сервером за першою відповіддю /get_task
+    codec = PayloadCodec()
 
     print(f"--- Worker {WORKER_ID} | Version {WORKER_VERSION} | Started ---")
     print(f"Connecting to server: {SERVER_URL}")
 
+    # Прогрес потокових завдань, незавершених до зупинки воркера
+    checkpoints = CheckpointStore(
+        os.path.join(os.path.dirname(sys.executable), CHECKPOINT_DIR)
+    )
+
+    # Кількість завдань, які воркер виконує одночасно
+    slots = TASK_SLOTS or detect_slot_count(TASK_SLOT_RAM_MB)
+    executor = SlotExecutor(slots, error_sleep=TASK_ERROR_SLEEP)
+    print(f"Task slots: {slots}")
+
+    # Завдання виконуються в окремих "теплих" процесах (по одному на слот) з лімітами
+    # часу і пам'яті; модулі завдань і браузери прогріваються в них у фоні, не
+    # затримуючи першого звернення до сервера. Браузери ділимо між процесами порівну.
+    if TASK_ISOLATION:
+        browser_pool = (
+            max(1, BROWSER_POOL_SIZE // slots),
+            BROWSER_MAX_PAGES,
+            BROWSER_MAX_RSS_MB,
+        )
+        runners = RunnerPool(
+            [
+                TaskProcess(TASK_REGISTRY, TASK_TIMEOUT, TASK_MAX_RSS_MB, browser_pool)
+                for _ in range(slots)
+            ]
+        )
+    else:
+        browser_pool = (BROWSER_POOL_SIZE, BROWSER_MAX_PAGES, BROWSER_MAX_RSS_MB)
+        runners = RunnerPool([InProcessRunner(TASK_REGISTRY, browser_pool)] * slots)
+    runners.start()
+
+    # Сервер бачить, скільки ще завдань воркер може взяти і що це за машина,
+    # і за цим підбирає розмір пакетів (наприклад, shard_size для prom_pars)
+    host = HostSnapshot()
+
+    def capacity_headers() -> dict:
+        # Слот, зарезервований головним циклом під наступне завдання, рахується вільним;
+        # завдання, уже отримані наперед, займуть вільні слоти першими
+        free = max(0, executor.free_slots - prefetcher.queued)
+        return {
+            "X-Worker-Free-Slots": str(free),
+            "X-Worker-Slots": str(slots),
+            **host.header(),
+        }
+
+    # Завдання забираються у фоні, поки виконуються поточні,
+    # а результати відправляються, не чекаючи на відповідь сервера
+    prefetcher = TaskPrefetcher(
+        session,
+        SERVER_URL,
+        depth=TASK_QUEUE_DEPTH,
+        long_poll=TASK_LONG_POLL,
+        idle_backoff=Backoff(NO_TASK_SLEEP_MIN, NO_TASK_SLEEP),
+        error_backoff=Backoff(TIME_ERROR_SLEEP_MIN, TIME_ERROR_SLEEP),
+        headers=capacity_headers,
+        codec=codec,
+    )
+    # Результати спершу пишуться на диск і відправляються у фоні, доки сервер їх не підтвердить
+    submitter = ResultSubmitter(
+        session,
+        SERVER_URL,
+        spool=ResultSpool(
+            os.path.join(os.path.dirname(sys.executable), RESULT_SPOOL_FILE)
+        ),
+        batch_size=RESULT_SPOOL_BATCH,
+        backoff=Backoff(TIME_ERROR_SLEEP_MIN, TIME_ERROR_SLEEP),
+        codec=codec,
+    )
+    submitter.start()
+    # Поки завдання виконуються або чекають у черзі, їхня оренда на сервері
+    # продовжується разом зі звітом про прогрес
+    heartbeats = HeartbeatSender(
+        session,
+        SERVER_URL,
+        WORKER_ID,
+        HEARTBEAT_INTERVAL,
+        queued=prefetcher.queued_ids,
+    )
+    heartbeats.start()
+
+    # Локальна сторінка метрик для моніторингу і порівняння версій воркера
+    if METRICS_PORT:
+        metrics.REGISTRY.gauge("free_slots", lambda: executor.free_slots)
+        metrics.REGISTRY.gauge("queued_tasks", lambda: prefetcher.queued)
+        metrics.REGISTRY.gauge("spool_pending", submitter.spool.pending_count)
+        metrics.start_metrics_server(
+            METRICS_PORT, labels={"worker_id": WORKER_ID, "version": WORKER_VERSION}
+        )
+
+    # Спершу продовжуємо завдання, перервані попереднім запуском
+    for task in checkpoints.pending():
+        print(
+            f"--> Продовжуємо завдання '{task.get('task_type')}' (ID: {task.get('id')})"
+        )
+        executor.wait_for_slot()
+        executor.run(
+            run_regular_task,
+            task,
+            WORKER_ID,
+            session,
+            submitter,
+            checkpoints,
+            codec,
+            runners,
+            heartbeats,
+        )
+
+    prefetcher.start()
+
     while True:
-        task = None
+        # Беремо нове завдання лише тоді, коли є вільний слот
+        executor.wait_for_slot()
+        slot_reserved = True
         try:
-            # Отримуємо завдання від сервера
-            response = session.get(f"{SERVER_URL}/get_task", timeout=20)
-            response.raise_for_status()
-            task = response.json()
-
-            # Якщо задач немає, чекаємо поки з'являться
-            if task.get("status") == "no_tasks":
-                time.sleep(NO_TASK_SLEEP)
-                continue
+            task = prefetcher.get()
 
-            # Виконуємо завдання
             task_id = task.get("id")
             task_type = task.get("task_type")
             params = task.get("params", {})
             print(f"--> Отримано завдання '{task_type}' (ID: {task_id})")
 
-            # Обробка завдання в залежності від типу
+            # Оновлення виконується в головному потоці, коли всі слоти вільні
             if task_type == "update_worker":
+                executor.release_slot()
+                slot_reserved = False
                 try:
-                    handle_update(params)
+                    # Перед оновленням завершуємо завдання і досилаємо всі готові результати
+                    prefetcher.pause()
+                    executor.wait_idle()
+                    submitter.flush(timeout=UPDATE_FLUSH_TIMEOUT)
+                    handle_update(params, runners)
 
                 except Exception as e:
                     # Якщо сталася помилка, надсилаємо повідомлення про помилку на сервер
@@ -220,46 +483,35 @@ def main_loop():
                         "status": "failure",
                         "result": {"error": str(e)},
                     }
-                    session.post(
-                        f"{SERVER_URL}/submit_result", json=failure_payload, timeout=60
-                    )
+                    submitter.submit(failure_payload)
                     # А воркер переходить в сон
                     time.sleep(UPDATE_ERROR_SLEEP)
+                    runners.start()
+                    prefetcher.resume()
+                continue
 
-            else:
-                result_data, status = None, "failure"
-                try:
-                    # Викликаємо функцію для виконання завдання
-                    result_data = execute_regular_task(task_type, params)
-                    status = "success"
+            # Завдання виконується у своєму слоті; при помилці "відпочиває" лише цей слот
+            executor.run(
+                run_regular_task,
+                task,
+                WORKER_ID,
+                session,
+                submitter,
+                checkpoints,
+                codec,
+                runners,
+                heartbeats,
+            )
+            slot_reserved = False
 
-                except Exception as e:
-                    # Якщо сталася помилка, формуємо повідомлення про помилку для серверу
-                    result_data = {"error": str(e)}
-                    status = "failure"
-
-                # Відправляємо результат (успішний або звіт про помилку)
-                result_payload = {
-                    "task_id": task_id,
-                    "worker_id": WORKER_ID,
-                    "status": status,
-                    "result": result_data,
-                }
-                session.post(
-                    f"{SERVER_URL}/submit_result", json=result_payload, timeout=60
-                ).raise_for_status()
-
-                # Якщо завдання провалено, воркер переходить в сон
-                if status == "failure":
-                    time.sleep(TASK_ERROR_SLEEP)
-
-        # Якщо сталася помилка при зєднанні з сервером, воркер переходить в короткий сон
-        except requests.exceptions.RequestException as e:
-            time.sleep(TIME_ERROR_SLEEP)
         # Якщо сталася невідома помилка, воркер переходить в короткий сон
         except Exception as e:
+            if slot_reserved:
+                executor.release_slot()
             time.sleep(TIME_ERROR_SLEEP)
 
 
 if __name__ == "__main__":
+    # Потрібно для запуску процесів завдань з exe, зібраного PyInstaller
+    multiprocessing.freeze_support()
     main_loop()
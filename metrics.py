@@ -0,0 +1,258 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Префікс імен метрик на сторінці /metrics
+METRICS_PREFIX = "hive_worker"
+# Скільки останніх вимірів кожної метрики зберігати для квантилів
+SAMPLE_WINDOW = 1024
+
+
+class _Summary:
+    """Кількість, сума, максимум і останні виміри однієї величини."""
+
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    """
+    Потокобезпечний набір лічильників (inc) і розподілів (observe).
+    Імена лічильників закінчуються на _total, розподілів - на одиницю виміру
+    (_seconds, _bytes).
+    """
+
+    def __init__(self, window: int = SAMPLE_WINDOW):
+        self.window = window
+        self.started = time.monotonic()
+        self._counters = {}
+        self._summaries = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = _Summary(self.window)
+            summary.add(value)
+
+    def export(self) -> dict:
+        """Повний стан метрик (для передачі з процесу завдання в процес воркера)."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "summaries": {
+                    name: (s.count, s.total, s.max, list(s.samples))
+                    for name, s in self._summaries.items()
+                },
+            }
+
+    def merge(self, exported: dict):
+        """Додає метрики, отримані через export() з іншого процесу."""
+        with self._lock:
+            for name, value in exported["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            for name, (count, total, maximum, samples) in exported["summaries"].items():
+                summary = self._summaries.get(name)
+                if summary is None:
+                    summary = self._summaries[name] = _Summary(self.window)
+                summary.count += count
+                summary.total += total
+                summary.max = max(summary.max, maximum)
+                summary.samples.extend(samples)
+
+    def counter(self, name: str) -> float:
+        """Поточне значення лічильника name."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def samples(self, name: str) -> list:
+        """Останні виміри розподілу name."""
+        with self._lock:
+            summary = self._summaries.get(name)
+            return list(summary.samples) if summary else []
+
+    def gauge(self, name: str, fn):
+        """Реєструє поточне значення, яке обчислюється функцією fn під час читання."""
+        with self._lock:
+            self._gauges[name] = fn
+
+    def compact(self) -> dict:
+        """
+        Короткий підсумок для відправки разом з результатом:
+        лічильники як є, розподіли як [count, sum, p50, p95, max].
+        """
+        with self._lock:
+            summary = {
+                "run_seconds": round(time.monotonic() - self.started, 3),
+                "counters": dict(self._counters),
+                "timings": {
+                    name: [
+                        s.count,
+                        round(s.total, 3),
+                        round(s.quantile(0.5), 3),
+                        round(s.quantile(0.95), 3),
+                        round(s.max, 3),
+                    ]
+                    for name, s in self._summaries.items()
+                },
+            }
+        return summary
+
+    def render(self, prefix: str = METRICS_PREFIX, labels: dict = None) -> str:
+        """Текстовий формат Prometheus."""
+        lines = []
+        if labels:
+            pairs = ",".join(f'{key}="{value}"' for key, value in labels.items())
+            lines += [f"# TYPE {prefix}_info gauge", f"{prefix}_info{{{pairs}}} 1"]
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = {
+                name: (s.count, s.total, s.quantile(0.5), s.quantile(0.95))
+                for name, s in self._summaries.items()
+            }
+            gauges = dict(self._gauges)
+
+        for name, value in sorted(counters.items()):
+            lines += [f"# TYPE {prefix}_{name} counter", f"{prefix}_{name} {value}"]
+        for name, (count, total, p50, p95) in sorted(summaries.items()):
+            lines += [
+                f"# TYPE {prefix}_{name} summary",
+                f'{prefix}_{name}{{quantile="0.5"}} {p50:.6f}',
+                f'{prefix}_{name}{{quantile="0.95"}} {p95:.6f}',
+                f"{prefix}_{name}_sum {total:.6f}",
+                f"{prefix}_{name}_count {count}",
+            ]
+        for name, fn in sorted(gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+# Метрики всього процесу (для /metrics)
+REGISTRY = MetricsRegistry()
+# Метрики поточного завдання; успадковуються потоками через bind()
+_task_metrics = contextvars.ContextVar("task_metrics", default=None)
+
+
+def inc(name: str, value: float = 1):
+    """Збільшує лічильник процесу і поточного завдання."""
+    REGISTRY.inc(name, value)
+    scope = _task_metrics.get()
+    if scope is not None:
+        scope.inc(name, value)
+
+
+def observe(name: str, value: float):
+    """Додає вимір до розподілу процесу і поточного завдання."""
+    REGISTRY.observe(name, value)
+    scope = _task_metrics.get()
+    if scope is not None:
+        scope.observe(name, value)
+
+
+def merge(exported: dict):
+    """Додає метрики з іншого процесу до метрик процесу і поточного завдання."""
+    REGISTRY.merge(exported)
+    scope = _task_metrics.get()
+    if scope is not None:
+        scope.merge(exported)
+
+
+@contextmanager
+def timer(name: str):
+    """Вимірює тривалість блоку в секундах."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+
+@contextmanager
+def task_scope():
+    """Збирає метрики одного завдання, поки виконується блок."""
+    scope = MetricsRegistry()
+    token = _task_metrics.set(scope)
+    try:
+        yield scope
+    finally:
+        _task_metrics.reset(token)
+
+
+def current_task_metrics() -> MetricsRegistry | None:
+    return _task_metrics.get()
+
+
+def bind(fn):
+    """Повертає fn, яка в будь-якому потоці пише метрики в завдання, що її створило."""
+    scope = _task_metrics.get()
+
+    def wrapper(*args, **kwargs):
+        token = _task_metrics.set(scope)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _task_metrics.reset(token)
+
+    return wrapper
+
+
+def start_metrics_server(port: int, labels: dict = None) -> ThreadingHTTPServer | None:
+    """
+    Запускає локальний HTTP-сервер з метриками на http://127.0.0.1:port/metrics.
+    Якщо порт зайнятий, воркер працює далі без нього.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render(labels=labels).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    except OSError as e:
+        print(f"Сервер метрик не запущено (порт {port}): {e}")
+        return None
+    threading.Thread(
+        target=server.serve_forever, name="metrics_server", daemon=True
+    ).start()
+    return server
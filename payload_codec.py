@@ -0,0 +1,159 @@
+import gzip
+import json
+import threading
+import requests
+
+import metrics
+
+try:
+    import zstandard
+except ImportError:  # zstd необов'язковий, без нього використовується gzip
+    zstandard = None
+
+# Заголовок, яким сервер повідомляє, які формати результату він приймає,
+# наприклад "columnar, zstd, gzip". Без нього воркер відправляє звичайний JSON.
+ENCODINGS_HEADER = "X-Result-Encodings"
+COLUMNAR_FORMAT = "columnar-v1"
+# Поля payload, які містять списки записів і можуть бути перетворені на колонки
+COLUMNAR_FIELDS = ("result", "items")
+# Стискати лише тіла, більші за цей розмір (байт)
+COMPRESS_MIN_SIZE = 1024
+
+
+def _encode_column(values: list) -> dict:
+    """
+    Кодує одну колонку:
+    - "digits": цілі 0..9 (наприклад, status_id) - рядок по символу на запис, "." для null;
+    - "int": цілі з null - щільний список значень і список індексів null;
+    - "raw": усе інше без змін.
+    """
+    if all(v is None or (type(v) is int and 0 <= v <= 9) for v in values):
+        return {
+            "type": "digits",
+            "data": "".join("." if v is None else str(v) for v in values),
+        }
+    if all(v is None or type(v) is int for v in values):
+        return {
+            "type": "int",
+            "nulls": [i for i, v in enumerate(values) if v is None],
+            "data": [v for v in values if v is not None],
+        }
+    return {"type": "raw", "data": values}
+
+
+def to_columnar(rows: list) -> dict | None:
+    """Перетворює список однотипних словників на колонки; None, якщо це неможливо."""
+    if not rows or not all(isinstance(row, dict) for row in rows):
+        return None
+    keys = list(rows[0])
+    if any(list(row) != keys for row in rows):
+        return None
+    return {
+        "count": len(rows),
+        "columns": {key: _encode_column([row[key] for row in rows]) for key in keys},
+    }
+
+
+def _decode_column(column: dict, count: int) -> list:
+    if column["type"] == "digits":
+        return [None if c == "." else int(c) for c in column["data"]]
+    if column["type"] == "int":
+        nulls = set(column["nulls"])
+        values = iter(column["data"])
+        return [None if i in nulls else next(values) for i in range(count)]
+    return column["data"]
+
+
+def from_columnar(table: dict) -> list:
+    """Зворотне перетворення колонок на список словників (для перевірки та серверної сторони)."""
+    count = table["count"]
+    columns = {
+        key: _decode_column(column, count) for key, column in table["columns"].items()
+    }
+    return [{key: values[i] for key, values in columns.items()} for i in range(count)]
+
+
+def compress(data: bytes, method: str) -> bytes:
+    if method == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+class PayloadCodec:
+    """
+    Узгоджений з сервером формат тіла запитів з результатами.
+    Сервер оголошує підтримувані формати заголовком X-Result-Encodings
+    у відповіді на /get_task; до того (і для старих серверів) воркер
+    відправляє звичайний JSON.
+    """
+
+    def __init__(self):
+        self.columnar = False
+        self.compression = None
+        self._lock = threading.Lock()
+
+    def update_from_headers(self, headers):
+        """Оновлює формат за заголовком відповіді сервера."""
+        value = headers.get(ENCODINGS_HEADER)
+        if value is None:
+            return
+        offered = {item.strip().lower() for item in value.split(",")}
+        with self._lock:
+            self.columnar = "columnar" in offered
+            if "zstd" in offered and zstandard is not None:
+                self.compression = "zstd"
+            elif "gzip" in offered:
+                self.compression = "gzip"
+            else:
+                self.compression = None
+
+    def disable(self):
+        """Повертається до звичайного JSON (сервер відхилив компактний формат)."""
+        with self._lock:
+            self.columnar = False
+            self.compression = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.columnar or self.compression is not None
+
+    def encode(self, payload: dict) -> tuple:
+        """Повертає (тіло запиту в байтах, заголовки)."""
+        with self._lock:
+            columnar, compression = self.columnar, self.compression
+
+        if columnar:
+            payload = dict(payload)
+            for field in COLUMNAR_FIELDS:
+                table = to_columnar(payload.get(field))
+                if table is not None:
+                    payload[field] = table
+                    payload[f"{field}_format"] = COLUMNAR_FORMAT
+
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+        headers = {"Content-Type": "application/json"}
+        if compression and len(body) >= COMPRESS_MIN_SIZE:
+            body = compress(body, compression)
+            headers["Content-Encoding"] = compression
+        return body, headers
+
+
+def post_payload(
+    session: requests.Session, url: str, payload: dict, codec: PayloadCodec, timeout
+) -> requests.Response:
+    """
+    Відправляє payload у форматі codec. Якщо сервер не приймає компактний
+    формат (400/415), повторює запит звичайним JSON і більше його не використовує.
+    """
+    data, headers = codec.encode(payload)
+    with metrics.timer("submit_seconds"):
+        response = session.post(url, data=data, headers=headers, timeout=timeout)
+    if response.status_code in (400, 415) and codec.enabled:
+        codec.disable()
+        data, headers = codec.encode(payload)
+        with metrics.timer("submit_seconds"):
+            response = session.post(url, data=data, headers=headers, timeout=timeout)
+    metrics.observe("payload_bytes", len(data))
+    return response
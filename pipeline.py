@@ -0,0 +1,237 @@
+import queue
+import random
+import threading
+import time
+import requests
+
+import metrics
+from payload_codec import PayloadCodec, post_payload
+from spool import ResultSpool
+
+
+class Backoff:
+    """Експоненційна затримка з джитером і верхньою межею."""
+
+    def __init__(self, base: float, ceiling: float, factor: float = 2.0):
+        self.base = base
+        self.ceiling = ceiling
+        self.factor = factor
+        self._attempt = 0
+
+    def next(self) -> float:
+        """Повертає наступну затримку: випадкове значення в [delay/2, delay]."""
+        delay = min(self.ceiling, self.base * self.factor**self._attempt)
+        self._attempt += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self._attempt = 0
+
+
+class TaskPrefetcher:
+    """
+    Фоновий потік, який заздалегідь забирає завдання з сервера в локальну
+    чергу глибиною depth, поки воркер виконує поточне. Коли завдань немає,
+    використовує long-polling (параметр wait) та експоненційну затримку
+    замість фіксованого сну. headers - функція, що повертає додаткові
+    заголовки для кожного запиту (наприклад, вільну місткість воркера).
+    Заголовки відповіді передаються в codec для узгодження формату результатів.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        server_url: str,
+        depth: int,
+        long_poll: int,
+        idle_backoff: Backoff,
+        error_backoff: Backoff,
+        headers=None,
+        codec: PayloadCodec = None,
+    ):
+        self.session = session
+        self.headers = headers
+        self.codec = codec
+        self.server_url = server_url
+        self.long_poll = long_poll
+        self.idle_backoff = idle_backoff
+        self.error_backoff = error_backoff
+        self._queue = queue.Queue()
+        # Скільки отриманих, але ще не розпочатих завдань може лежати в черзі
+        self._free_places = threading.Semaphore(max(1, depth))
+        self._resume = threading.Event()
+        self._resume.set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="task_prefetcher", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._resume.set()
+
+    def get(self) -> dict:
+        """Блокує, доки в черзі не з'явиться завдання."""
+        task = self._queue.get()
+        self._free_places.release()
+        return task
+
+    @property
+    def queued(self) -> int:
+        """Кількість отриманих, але ще не розпочатих завдань."""
+        return self._queue.qsize()
+
+    def queued_ids(self) -> list:
+        """ID отриманих завдань, які чекають у черзі на вільний слот."""
+        with self._queue.mutex:
+            return [task.get("id") for task in self._queue.queue]
+
+    def pause(self):
+        """Припиняє забирати нові завдання (наприклад, на час сну після помилки)."""
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    def _fetch(self) -> dict:
+        params = {"wait": self.long_poll} if self.long_poll else None
+        with metrics.timer("task_fetch_seconds"):
+            response = self.session.get(
+                f"{self.server_url}/get_task",
+                params=params,
+                headers=self.headers() if self.headers else None,
+                timeout=self.long_poll + 20,
+            )
+        response.raise_for_status()
+        if self.codec:
+            self.codec.update_from_headers(response.headers)
+        return response.json()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Чекаємо на вільне місце в черзі, і лише потім просимо завдання
+            self._free_places.acquire()
+            task = None
+            try:
+                self._resume.wait()
+                if self._stop.is_set():
+                    return
+                try:
+                    task = self._fetch()
+                except (requests.exceptions.RequestException, ValueError):
+                    # Сервер недоступний - чекаємо все довше, але не більше стелі
+                    metrics.inc("task_fetch_errors_total")
+                    self._stop.wait(self.error_backoff.next())
+                    task = None
+                    continue
+                self.error_backoff.reset()
+
+                # Якщо задач немає, чекаємо поки з'являться
+                if task.get("status") == "no_tasks":
+                    self._stop.wait(self.idle_backoff.next())
+                    task = None
+                    continue
+                self.idle_backoff.reset()
+                self._queue.put(task)
+            finally:
+                if task is None:
+                    self._free_places.release()
+
+
+class ResultSubmitter:
+    """
+    Фоновий потік, що відправляє результати на сервер, не блокуючи
+    виконання наступного завдання. Кожен результат спершу записується
+    в ResultSpool і позначається підтвердженим лише після відповіді сервера.
+    Поки сервер недоступний, непідтверджені результати чекають на диску
+    і відправляються пачками по batch_size з експоненційною затримкою.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        server_url: str,
+        spool: ResultSpool,
+        batch_size: int,
+        backoff: Backoff,
+        codec: PayloadCodec,
+    ):
+        self.session = session
+        self.server_url = server_url
+        self.spool = spool
+        self.batch_size = batch_size
+        self.backoff = backoff
+        self.codec = codec
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="result_submitter", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, payload: dict):
+        """Надійно записує результат у spool і будить потік відправки."""
+        self.spool.add(payload)
+        self._wakeup.set()
+
+    def flush(self, timeout: float) -> bool:
+        """Чекає до timeout секунд, доки spool спорожніє. Повертає True, якщо все відправлено."""
+        deadline = time.monotonic() + timeout
+        while self.spool.pending_count():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+        return True
+
+    def _send(self, payload: dict):
+        response = post_payload(
+            self.session,
+            f"{self.server_url}/submit_result",
+            payload,
+            self.codec,
+            timeout=60,
+        )
+        # Помилки клієнта (крім тимчасових) не виправляться повтором - відкидаємо результат
+        if 400 <= response.status_code < 500 and response.status_code not in (
+            408,
+            429,
+        ):
+            print(
+                f"Сервер відхилив результат {payload.get('task_id')}: {response.status_code}"
+            )
+            return
+        response.raise_for_status()
+
+    def _run(self):
+        while True:
+            try:
+                self._submit_pending()
+            except Exception as e:
+                # Помилка spool (заблокована чи пошкоджена база, повний диск) або
+                # непередбачена помилка не повинна тихо зупинити відправку результатів
+                print(f"Помилка відправки результатів: {e}")
+                metrics.inc("submit_loop_errors_total")
+                time.sleep(self.backoff.next())
+
+    def _submit_pending(self):
+        batch = self.spool.pending(self.batch_size)
+        if not batch:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            return
+
+        for row_id, payload in batch:
+            try:
+                self._send(payload)
+            except requests.exceptions.RequestException:
+                # Сервер недоступний - повторимо всю пачку пізніше
+                metrics.inc("submit_errors_total")
+                self.spool.record_attempt(row_id)
+                time.sleep(self.backoff.next())
+                break
+            self.spool.ack(row_id)
+            self.backoff.reset()
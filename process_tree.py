@@ -0,0 +1,38 @@
+import psutil
+
+# Скільки секунд чекати, поки вбиті процеси справді завершаться
+KILL_WAIT_TIMEOUT = 5
+
+
+def process_tree(pid: int) -> list:
+    """Процес pid і всі його нащадки (порожній список, якщо процесу вже немає)."""
+    try:
+        root = psutil.Process(pid)
+        return [root] + root.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def tree_rss_mb(pid: int) -> float:
+    """Сумарна пам'ять (RSS, МБ) процесу pid і всіх його нащадків."""
+    total = 0
+    for proc in process_tree(pid):
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+
+def kill_process_tree(pid: int):
+    """
+    Завершує процес pid разом з усіма його нащадками. Обходить лише
+    дерево цього процесу, а не всі процеси системи.
+    """
+    processes = process_tree(pid)
+    for proc in processes:
+        try:
+            proc.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(processes, timeout=KILL_WAIT_TIMEOUT)
@@ -0,0 +1,379 @@
+import hashlib
+import json
+import os
+import shutil
+import struct
+import time
+import zipfile
+import zlib
+
+import requests
+import urllib3
+
+import metrics
+
+try:
+    import bsdiff4
+except ImportError:  # bsdiff4 необов'язковий, без нього завантажується повний архів
+    bsdiff4 = None
+
+# Ім'я виконуваного файлу воркера в архіві оновлення
+WORKER_EXE_NAME = "worker.exe"
+# Межі розміру порції завантаження в байтах
+UPDATE_CHUNK_MIN = 64 * 1024
+UPDATE_CHUNK_MAX = 4 * 1024 * 1024
+# Розмір порції підбирається так, щоб одна порція читалася приблизно стільки секунд
+UPDATE_CHUNK_SECONDS = 0.5
+# Тайм-аути (з'єднання, читання) одного запиту завантаження
+UPDATE_TIMEOUT = (10, 60)
+# Скільки разів поспіль докачувати після обриву з'єднання
+UPDATE_RETRIES = 8
+# Початкова і максимальна пауза між спробами докачування в секундах
+UPDATE_RETRY_SLEEP_MIN = 2
+UPDATE_RETRY_SLEEP = 60
+# Скільки байт з кінця архіву завантажувати для пошуку центрального каталогу zip
+ZIP_TAIL_SIZE = 64 * 1024
+# Розмір порції при розпаковці і хешуванні файлів на диску
+COPY_CHUNK = 1024 * 1024
+
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_EOCD = struct.Struct("<4s4H2LH")
+_CENTRAL_SIGNATURE = b"PK\x01\x02"
+_CENTRAL = struct.Struct("<4s6H3L5H2L")
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+_LOCAL = struct.Struct("<4s5H3L2H")
+
+
+class UpdateVerificationError(RuntimeError):
+    """Завантажений файл оновлення не збігається з очікуваним хешем."""
+
+
+class _RangeNotSupported(Exception):
+    """Сервер віддає файл лише цілком, без Range."""
+
+
+def _next_chunk_size(chunk_size: int, elapsed: float) -> int:
+    # Швидке з'єднання - більші порції (менше накладних витрат), повільне - менші
+    if elapsed < UPDATE_CHUNK_SECONDS / 2:
+        chunk_size *= 2
+    elif elapsed > UPDATE_CHUNK_SECONDS * 2:
+        chunk_size //= 2
+    return max(UPDATE_CHUNK_MIN, min(UPDATE_CHUNK_MAX, chunk_size))
+
+
+def _read_json(path: str) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def remove_partial(path: str):
+    """Видаляє недокачаний файл разом з його описом."""
+    for name in (path, path + ".json"):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def download(
+    session: requests.Session,
+    url: str,
+    path: str,
+    first: int = 0,
+    length: int = None,
+):
+    """
+    Завантажує з url байти [first, first + length) (або весь файл) у path.
+    Вже завантажена частина (з попередньої спроби чи попереднього запуску
+    воркера) докачується через Range; If-Range гарантує, що файл на сервері
+    за цей час не змінився. Обрив з'єднання - не помилка, а нова спроба.
+    """
+    meta_path = path + ".json"
+    meta = _read_json(meta_path)
+    if (
+        not os.path.exists(path)
+        or meta is None
+        or (meta.get("url"), meta.get("first"), meta.get("length"))
+        != (url, first, length)
+    ):
+        # Недокачаний файл від іншої версії - починаємо спочатку
+        open(path, "wb").close()
+        meta = {"url": url, "first": first, "length": length, "validator": None}
+        _write_json(meta_path, meta)
+
+    chunk_size = UPDATE_CHUNK_MIN
+    failures = 0
+    with metrics.timer("update_download_seconds"):
+        while True:
+            done = os.path.getsize(path)
+            if length is not None and done >= length:
+                return
+
+            # Без стиснення при передачі, щоб зміщення в Range збігалися з байтами файлу
+            headers = {"Accept-Encoding": "identity"}
+            partial = bool(done or first or length is not None)
+            if partial:
+                last = "" if length is None else first + length - 1
+                headers["Range"] = f"bytes={first + done}-{last}"
+                if done and meta["validator"]:
+                    headers["If-Range"] = meta["validator"]
+            try:
+                with session.get(
+                    url, headers=headers, stream=True, timeout=UPDATE_TIMEOUT
+                ) as response:
+                    response.raise_for_status()
+                    if partial and response.status_code != 206:
+                        if first or length is not None:
+                            raise _RangeNotSupported()
+                        # Файл на сервері змінився або Range не підтримується - з нуля
+                        done = 0
+                    validator = response.headers.get("ETag") or response.headers.get(
+                        "Last-Modified"
+                    )
+                    if validator != meta["validator"]:
+                        meta["validator"] = validator
+                        _write_json(meta_path, meta)
+                    expected = response.headers.get("Content-Length")
+
+                    received = 0
+                    with open(path, "r+b") as f:
+                        f.seek(done)
+                        f.truncate()
+                        while True:
+                            started = time.monotonic()
+                            chunk = response.raw.read(chunk_size)
+                            if not chunk:
+                                break
+                            f.write(chunk)
+                            received += len(chunk)
+                            failures = 0
+                            metrics.inc("update_download_bytes_total", len(chunk))
+                            chunk_size = _next_chunk_size(
+                                chunk_size, time.monotonic() - started
+                            )
+                    if expected is not None and received < int(expected):
+                        raise requests.ConnectionError("з'єднання обірвалося")
+                    if length is None:
+                        return
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                urllib3.exceptions.HTTPError,
+            ) as e:
+                failures += 1
+                if failures > UPDATE_RETRIES:
+                    raise
+                metrics.inc("update_download_retries_total")
+                pause = min(
+                    UPDATE_RETRY_SLEEP, UPDATE_RETRY_SLEEP_MIN * 2 ** (failures - 1)
+                )
+                print(
+                    f"Завантаження оновлення перервано ({e}), докачування через {pause} с..."
+                )
+                time.sleep(pause)
+
+
+def _get_range(session: requests.Session, url: str, spec: str) -> tuple[bytes, int]:
+    """Завантажує діапазон байтів; повертає (дані, повний розмір файлу)."""
+    response = session.get(
+        url,
+        headers={"Range": f"bytes={spec}", "Accept-Encoding": "identity"},
+        stream=True,
+        timeout=UPDATE_TIMEOUT,
+    )
+    with response:
+        response.raise_for_status()
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code != 206 or "/" not in content_range:
+            raise _RangeNotSupported()
+        total = content_range.rsplit("/", 1)[1]
+        return response.content, int(total) if total.isdigit() else None
+
+
+def _locate_member(session: requests.Session, url: str, name: str) -> dict | None:
+    """
+    Знаходить файл name в zip-архіві на сервері, завантаживши лише
+    центральний каталог і локальний заголовок. None, якщо архів не можна
+    так розібрати (zip64, шифрування, невідоме стиснення) - тоді
+    завантажується весь архів.
+    """
+    tail, total = _get_range(session, url, f"-{ZIP_TAIL_SIZE}")
+    position = tail.rfind(_EOCD_SIGNATURE)
+    if total is None or position < 0 or position + _EOCD.size > len(tail):
+        return None
+    _, _, _, _, entries, cd_size, cd_offset, _ = _EOCD.unpack_from(tail, position)
+    if cd_offset == 0xFFFFFFFF:
+        return None
+
+    tail_start = total - len(tail)
+    if cd_offset >= tail_start:
+        directory = tail[cd_offset - tail_start : cd_offset - tail_start + cd_size]
+    else:
+        directory, _ = _get_range(
+            session, url, f"{cd_offset}-{cd_offset + cd_size - 1}"
+        )
+
+    offset = 0
+    for _ in range(entries):
+        fields = _CENTRAL.unpack_from(directory, offset)
+        if fields[0] != _CENTRAL_SIGNATURE:
+            return None
+        flags, method, _, _, crc, csize, size, name_len, extra_len, comment_len = (
+            fields[3:13]
+        )
+        header_offset = fields[16]
+        entry_name = directory[
+            offset + _CENTRAL.size : offset + _CENTRAL.size + name_len
+        ]
+        offset += _CENTRAL.size + name_len + extra_len + comment_len
+        if entry_name.decode("utf-8", "replace") != name:
+            continue
+        if flags & 0x1 or method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            return None
+        if 0xFFFFFFFF in (csize, size, header_offset):
+            return None
+
+        local, _ = _get_range(
+            session, url, f"{header_offset}-{header_offset + _LOCAL.size - 1}"
+        )
+        local_fields = _LOCAL.unpack(local)
+        if local_fields[0] != _LOCAL_SIGNATURE:
+            return None
+        return {
+            "offset": header_offset + _LOCAL.size + local_fields[9] + local_fields[10],
+            "compressed_size": csize,
+            "size": size,
+            "method": method,
+            "crc": crc,
+        }
+    return None
+
+
+def _inflate_member(part_path: str, dest: str, member: dict):
+    """Розпаковує завантажені стиснені байти файлу з архіву, перевіряючи CRC32."""
+    decompressor = (
+        zlib.decompressobj(-zlib.MAX_WBITS)
+        if member["method"] == zipfile.ZIP_DEFLATED
+        else None
+    )
+    crc = 0
+    with open(part_path, "rb") as src, open(dest, "wb") as out:
+        while chunk := src.read(COPY_CHUNK):
+            data = decompressor.decompress(chunk) if decompressor else chunk
+            crc = zlib.crc32(data, crc)
+            out.write(data)
+        if decompressor:
+            data = decompressor.flush()
+            crc = zlib.crc32(data, crc)
+            out.write(data)
+    if crc != member["crc"] or os.path.getsize(dest) != member["size"]:
+        raise UpdateVerificationError(f"{WORKER_EXE_NAME} в архіві пошкоджено (CRC32).")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(COPY_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _verify(path: str, sha256: str | None):
+    if sha256 and file_sha256(path) != sha256.lower():
+        os.remove(path)
+        raise UpdateVerificationError(
+            f"SHA-256 нового {WORKER_EXE_NAME} не збігається з очікуваним."
+        )
+
+
+def _fetch_archive(session: requests.Session, url: str, work_dir: str, dest: str):
+    """
+    Дістає worker.exe з архіву за url. Якщо сервер підтримує Range,
+    завантажуються лише стиснені байти worker.exe (а не весь архів);
+    інакше архів завантажується повністю і з нього копіюється лише worker.exe.
+    """
+    part_path = os.path.join(work_dir, "worker_update.part")
+    try:
+        member = _locate_member(session, url, WORKER_EXE_NAME)
+        if member is not None:
+            download(
+                session, url, part_path, member["offset"], member["compressed_size"]
+            )
+            try:
+                _inflate_member(part_path, dest, member)
+            finally:
+                # Пошкоджені байти не докачуються повторно - наступна спроба з нуля
+                remove_partial(part_path)
+            return
+    except _RangeNotSupported:
+        pass
+
+    archive_path = os.path.join(work_dir, "update.zip.part")
+    download(session, url, archive_path)
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            if WORKER_EXE_NAME not in archive.namelist():
+                raise FileNotFoundError(f"{WORKER_EXE_NAME} не знайдено в архіві.")
+            with archive.open(WORKER_EXE_NAME) as src, open(dest, "wb") as out:
+                shutil.copyfileobj(src, out, COPY_CHUNK)
+    finally:
+        remove_partial(archive_path)
+
+
+def _apply_patch(
+    session: requests.Session, patch: dict, current_exe: str, work_dir: str, dest: str
+):
+    """Завантажує бінарний патч bsdiff4 і застосовує його до поточного exe."""
+    patch_path = os.path.join(work_dir, "worker_patch.part")
+    download(session, patch["url"], patch_path)
+    bsdiff4.file_patch(current_exe, dest, patch_path)
+    remove_partial(patch_path)
+
+
+def fetch_update(params: dict, current_exe: str, current_version: str, dest: str):
+    """
+    Завантажує новий exe воркера в dest за параметрами завдання update_worker:
+    url - zip-архів з worker.exe, sha256 - хеш нового worker.exe,
+    patches - [{"from_version", "url"}] бінарні патчі bsdiff4 від попередніх версій.
+    Патч використовується, якщо він є для поточної версії, встановлено bsdiff4
+    і відомий sha256 результату; якщо патч не вдався - завантажується архів.
+    """
+    url = params.get("url")
+    if not url:
+        raise ValueError("URL для оновлення не надано.")
+    sha256 = params.get("sha256")
+    if not sha256:
+        print("Сервер не надав sha256 оновлення - перевіряється лише CRC архіву.")
+
+    work_dir = os.path.dirname(dest)
+    with requests.Session() as session:
+        patch = next(
+            (
+                p
+                for p in params.get("patches") or []
+                if p.get("from_version") == current_version and p.get("url")
+            ),
+            None,
+        )
+        if patch and sha256 and bsdiff4 is not None:
+            try:
+                _apply_patch(session, patch, current_exe, work_dir, dest)
+                _verify(dest, sha256)
+                metrics.inc("update_delta_total")
+                return
+            except Exception as e:
+                # Патч не підійшов (наприклад, exe змінено) - завантажуємо повну версію
+                metrics.inc("update_delta_failed_total")
+                print(
+                    f"Не вдалося застосувати патч оновлення ({e}), завантажую архів..."
+                )
+                remove_partial(os.path.join(work_dir, "worker_patch.part"))
+
+        _fetch_archive(session, url, work_dir, dest)
+        _verify(dest, sha256)
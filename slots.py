@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+import psutil
+from concurrent.futures import ThreadPoolExecutor
+
+
+def detect_slot_count(ram_per_slot_mb: int) -> int:
+    """
+    Оцінює, скільки завдань машина потягне одночасно: половина фізичних
+    ядер, але не більше, ніж вміщує вільна пам'ять з розрахунку ram_per_slot_mb.
+    """
+    cpu_count = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    free_mb = psutil.virtual_memory().available / (1024 * 1024)
+    return max(1, min(cpu_count // 2, int(free_mb // ram_per_slot_mb)))
+
+
+class SlotExecutor:
+    """
+    Виконує до slots завдань одночасно в окремих потоках.
+    Слот, завдання якого завершилося помилкою, "відпочиває" error_sleep
+    секунд, а решта слотів продовжують працювати.
+    """
+
+    def __init__(self, slots: int, error_sleep: float):
+        self.slots = max(1, slots)
+        self.error_sleep = error_sleep
+        self._busy = 0
+        # Слоти, зарезервовані wait_for_slot, у яких ще не запущено завдання
+        self._reserved = 0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.slots, thread_name_prefix="task_slot"
+        )
+
+    @property
+    def free_slots(self) -> int:
+        """
+        Скільки ще завдань можна почати. Зарезервований слот, який чекає
+        на завдання від сервера, теж вважається вільним.
+        """
+        with self._cond:
+            return self.slots - self._busy + self._reserved
+
+    def wait_for_slot(self):
+        """Блокує, доки не звільниться слот, і резервує його."""
+        with self._cond:
+            while self._busy >= self.slots:
+                self._cond.wait()
+            self._busy += 1
+            self._reserved += 1
+
+    def release_slot(self):
+        """Звільняє слот, зарезервований wait_for_slot, але не використаний run."""
+        with self._cond:
+            self._reserved -= 1
+            self._release()
+
+    def run(self, fn, *args):
+        """
+        Запускає fn у зарезервованому слоті. fn повертає True при успіху;
+        при невдачі або винятку слот звільняється лише після error_sleep.
+        """
+        with self._cond:
+            self._reserved -= 1
+        self._executor.submit(self._run_in_slot, fn, *args)
+
+    def wait_idle(self):
+        """Чекає, доки всі слоти завершать свої завдання."""
+        with self._cond:
+            while self._busy:
+                self._cond.wait()
+
+    def _run_in_slot(self, fn, *args):
+        try:
+            succeeded = fn(*args)
+        except Exception:
+            succeeded = False
+        try:
+            if not succeeded:
+                time.sleep(self.error_sleep)
+        finally:
+            with self._cond:
+                self._release()
+
+    def _release(self):
+        # Викликається під self._cond
+        self._busy -= 1
+        self._cond.notify_all()
@@ -0,0 +1,90 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Скільки секунд зберігати вже підтверджені результати перед видаленням
+ACKED_RETENTION = 24 * 3600
+
+
+class ResultSpool:
+    """
+    Надійна черга результатів на диску (SQLite). Кожен результат записується
+    сюди до відправки і позначається підтвердженим після відповіді сервера,
+    тож результати переживають обрив мережі та перезапуск воркера.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                acked_at REAL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_pending ON results (acked_at, id)"
+        )
+        self._conn.commit()
+        self.purge()
+
+    def add(self, payload: dict) -> int:
+        """Записує результат і повертає його номер у черзі."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO results (task_id, payload, created_at) VALUES (?, ?, ?)",
+                (
+                    str(payload.get("task_id")),
+                    json.dumps(payload, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def pending(self, limit: int) -> list:
+        """Повертає до limit непідтверджених результатів у порядку запису: [(id, payload)]."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM results WHERE acked_at IS NULL ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM results WHERE acked_at IS NULL"
+            ).fetchone()[0]
+
+    def ack(self, row_id: int):
+        """Позначає результат як підтверджений сервером."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE results SET acked_at = ? WHERE id = ?", (time.time(), row_id)
+            )
+            self._conn.commit()
+
+    def record_attempt(self, row_id: int):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE results SET attempts = attempts + 1 WHERE id = ?", (row_id,)
+            )
+            self._conn.commit()
+
+    def purge(self):
+        """Видаляє давно підтверджені результати."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM results WHERE acked_at IS NOT NULL AND acked_at < ?",
+                (time.time() - ACKED_RETENTION,),
+            )
+            self._conn.commit()
@@ -0,0 +1,140 @@
+import time
+import threading
+import requests
+
+import metrics
+from checkpoints import CheckpointStore
+from payload_codec import PayloadCodec, post_payload
+
+# Скільки секунд чекати на з'єднання при відправці частини: недоступний
+# сервер не повинен надовго зупиняти завдання, що віддає елементи
+CHUNK_CONNECT_TIMEOUT = 10
+
+
+def drain(items, handle, stop=None):
+    """
+    Передає кожен елемент генератора в handle і повертає значення, з яким
+    генератор завершився (return), наприклад параметри продовження завдання.
+    Якщо після чергового елемента stop() повертає True, генератор
+    закривається і повертається None.
+    """
+    while True:
+        try:
+            item = next(items)
+        except StopIteration as stop_iteration:
+            return stop_iteration.value
+        handle(item)
+        if stop is not None and stop():
+            items.close()
+            return None
+
+
+class ChunkStreamer:
+    """
+    Відправляє результат потокового завдання на сервер частинами через
+    /submit_chunk і після кожного підтвердження зберігає прогрес у CheckpointStore.
+    Частина відправляється, коли назбиралося chunk_size елементів або
+    минуло interval секунд з попередньої відправки. Відправка робиться
+    однією спробою без очікування: після невдачі наступна спроба - не раніше
+    ніж через interval секунд, а елементи лишаються в буфері і в разі
+    чого потрапляють у фінальний submit_result, який надійно відправляє spool.
+
+    Якщо сервер не підтримує /submit_chunk (404/405), елементи накопичуються
+    і відправляються разом у фінальному submit_result, як раніше.
+    """
+
+    # Чи підтримує сервер /submit_chunk (None - ще невідомо); спільне для процесу
+    _supported = None
+    _supported_lock = threading.Lock()
+
+    def __init__(
+        self,
+        session: requests.Session,
+        server_url: str,
+        worker_id: str,
+        task: dict,
+        checkpoints: CheckpointStore,
+        acked: int,
+        chunk_size: int,
+        interval: float,
+        codec: PayloadCodec,
+    ):
+        self.session = session
+        self.server_url = server_url
+        self.worker_id = worker_id
+        self.task = task
+        self.checkpoints = checkpoints
+        self.acked = acked
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.codec = codec
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        # Після невдалої відправки - не раніше цього моменту
+        self._retry_at = 0.0
+
+    def add(self, item):
+        self._buffer.append(item)
+        if (
+            len(self._buffer) >= self.chunk_size
+            or time.monotonic() - self._last_flush >= self.interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """Відправляє накопичені елементи; при невдачі вони лишаються в буфері."""
+        now = time.monotonic()
+        self._last_flush = now
+        if (
+            not self._buffer
+            or ChunkStreamer._supported is False
+            or now < self._retry_at
+        ):
+            return
+
+        payload = {
+            "task_id": self.task.get("id"),
+            "worker_id": self.worker_id,
+            "offset": self.acked,
+            "items": self._buffer,
+        }
+        try:
+            response = post_payload(
+                self.session,
+                f"{self.server_url}/submit_chunk",
+                payload,
+                self.codec,
+                timeout=(CHUNK_CONNECT_TIMEOUT, 60),
+            )
+            if response.status_code in (404, 405):
+                # Старий сервер - далі працюємо одним submit_result
+                with ChunkStreamer._supported_lock:
+                    ChunkStreamer._supported = False
+                return
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            # Сервер недоступний - завдання працює далі, повторимо через interval
+            metrics.inc("chunk_errors_total")
+            self._retry_at = time.monotonic() + self.interval
+            return
+
+        with ChunkStreamer._supported_lock:
+            ChunkStreamer._supported = True
+        self.acked += len(self._buffer)
+        self._buffer = []
+        self.checkpoints.save(self.task, self.acked)
+
+    def final_payload(self, status: str, error: str = None) -> dict:
+        """
+        Формує фінальний submit_result. result містить лише елементи,
+        які ще не було підтверджено, а offset - з якого елемента вони починаються.
+        """
+        payload = {
+            "task_id": self.task.get("id"),
+            "worker_id": self.worker_id,
+            "status": status,
+            "result": {"error": error} if error else self._buffer,
+        }
+        if self.acked:
+            payload["offset"] = self.acked
+        return payload
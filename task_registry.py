@@ -0,0 +1,77 @@
+import importlib
+import importlib.util
+import re
+import threading
+
+# Пакет, у якому шукаються модулі завдань, не вказані в реєстрі
+TASKS_PACKAGE = "tasks"
+# Функція, яку має містити модуль завдання, щоб бути знайденим автоматично
+DISCOVERY_ENTRY_POINT = "run"
+# Допустима назва завдання для автоматичного пошуку (лише ім'я модуля, без крапок)
+_TASK_NAME_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+class TaskRegistry:
+    """
+    Реєстр завдань з відкладеним імпортом. Значення реєстру - рядки
+    "модуль:функція" (або вже імпортовані функції). Модуль завдання
+    імпортується лише при першому завданні цього типу і лишається в пам'яті.
+
+    Завдання, якого немає в реєстрі, шукається в tasks/<назва>.py:
+    такий модуль має містити функцію run.
+    """
+
+    def __init__(self, entries: dict):
+        self._entries = dict(entries)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, task_name: str):
+        """Повертає функцію завдання, імпортуючи її модуль за потреби."""
+        task_fn = self._loaded.get(task_name)
+        if task_fn is not None:
+            return task_fn
+
+        # Два слоти можуть одночасно отримати перше завдання одного типу
+        with self._lock:
+            task_fn = self._loaded.get(task_name)
+            if task_fn is None:
+                task_fn = self._import(task_name)
+                self._loaded[task_name] = task_fn
+        return task_fn
+
+    def get(self, task_name: str):
+        """Як resolve, але повертає None, якщо завдання не вдалося знайти чи імпортувати."""
+        try:
+            return self.resolve(task_name)
+        except Exception:
+            return None
+
+    def preload(self):
+        """Імпортує всі завдання з реєстру (наприклад, щоб порівняти час старту)."""
+        for task_name in self._entries:
+            self.resolve(task_name)
+
+    def _import(self, task_name: str):
+        target = self._entries.get(task_name)
+        if callable(target):
+            return target
+        if target is None:
+            target = self._discover(task_name)
+
+        module_name, _, attr = target.partition(":")
+        task_fn = getattr(importlib.import_module(module_name), attr, None)
+        if not callable(task_fn):
+            raise ValueError(f"'{target}' не є функцією завдання.")
+        return task_fn
+
+    @staticmethod
+    def _discover(task_name: str) -> str:
+        module_name = f"{TASKS_PACKAGE}.{task_name}"
+        if (
+            not isinstance(task_name, str)
+            or not _TASK_NAME_RE.match(task_name)
+            or importlib.util.find_spec(module_name) is None
+        ):
+            raise ValueError(f"Завдання '{task_name}' не знайдено в реєстрі.")
+        return f"{module_name}:{DISCOVERY_ENTRY_POINT}"
@@ -0,0 +1,266 @@
+import os
+import sys
+import threading
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service as ChromeService
+from webdriver_manager.chrome import ChromeDriverManager
+
+import metrics
+from process_tree import kill_process_tree, tree_rss_mb
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
+
+# Файл поруч з воркером, у якому зберігається шлях до вже знайденого chromedriver
+DRIVER_PATH_CACHE_FILE = "chromedriver_path.txt"
+
+# --- ПРОФІЛІ ЗАВАНТАЖЕННЯ СТОРІНОК ---
+# URL-шаблони, які "легкий" профіль блокує через DevTools (шрифти, стилі,
+# медіа, аналітика і реклама не потрібні для читання data-qa* атрибутів)
+LEAN_BLOCKED_URLS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.avif",
+    "*.svg",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.eot",
+    "*.css",
+    "*.mp4",
+    "*.webm",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*facebook.net*",
+    "*connect.facebook.*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+    "*criteo.*",
+    "*tiktok.com*",
+]
+
+# page_load_strategy: "normal" чекає на всі ресурси, "eager" - лише на DOM
+# (готовність блоку товару далі перевіряє скрипт витягування даних)
+LOAD_PROFILES = {
+    "full": {
+        "page_load_strategy": "normal",
+        "blocked_urls": [],
+        "page_load_timeout": 300,
+    },
+    "lean": {
+        "page_load_strategy": "eager",
+        "blocked_urls": LEAN_BLOCKED_URLS,
+        "page_load_timeout": 30,
+    },
+}
+# Профіль, з яким створюються headless-браузери
+LOAD_PROFILE = "lean"
+# Ліміт дискового кешу Chrome в МБ, щоб профіль не ріс між чистками
+DISK_CACHE_MB = 64
+
+_driver_path_lock = threading.Lock()
+_driver_path = None
+# PID процесів chromedriver, запущених цим процесом (Chrome - їхні нащадки)
+_spawned_pids = set()
+_spawned_lock = threading.Lock()
+
+
+def _driver_pid(driver) -> int | None:
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+def quit_browser(driver):
+    """
+    Закриває браузер. Якщо chromedriver або Chrome не завершилися самі,
+    добиває дерево процесів саме цього chromedriver.
+    """
+    pid = _driver_pid(driver)
+    try:
+        driver.quit()
+    except Exception:
+        pass
+    if pid is not None:
+        kill_process_tree(pid)
+        with _spawned_lock:
+            _spawned_pids.discard(pid)
+
+
+def cleanup_spawned_browsers():
+    """Завершує всі браузери, запущені цим процесом, які ще не було закрито."""
+    with _spawned_lock:
+        pids = list(_spawned_pids)
+        _spawned_pids.clear()
+    for pid in pids:
+        kill_process_tree(pid)
+
+
+def _driver_path_cache() -> str:
+    return os.path.join(os.path.dirname(sys.executable), DRIVER_PATH_CACHE_FILE)
+
+
+def resolve_driver_path(refresh: bool = False) -> str:
+    """
+    Повертає шлях до chromedriver. Шлях, знайдений ChromeDriverManager,
+    кешується в пам'яті та на диску, тому звичайний запуск браузера
+    не робить жодних перевірок версій.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if not refresh:
+            if _driver_path and os.path.exists(_driver_path):
+                return _driver_path
+            try:
+                with open(_driver_path_cache(), "r", encoding="utf-8") as f:
+                    cached_path = f.read().strip()
+                if cached_path and os.path.exists(cached_path):
+                    _driver_path = cached_path
+                    return _driver_path
+            except IOError:
+                pass
+
+        _driver_path = ChromeDriverManager().install()
+        try:
+            temp_path = _driver_path_cache() + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(_driver_path)
+            os.replace(temp_path, _driver_path_cache())
+        except IOError:
+            pass  # Кеш на диску не обов'язковий
+        return _driver_path
+
+
+def create_browser(headless=True, profile_dir="chrome_profile", load_profile=None):
+    """
+    Створює екземпляр Chrome з налаштуваннями для тихої та ефективної роботи.
+    load_profile - ключ LOAD_PROFILES; за замовчуванням headless-браузер
+    отримує LOAD_PROFILE, а видимий (для ручної капчі) - повний профіль.
+    """
+    if load_profile is None:
+        load_profile = LOAD_PROFILE if headless else "full"
+    profile = LOAD_PROFILES[load_profile]
+
+    options = webdriver.ChromeOptions()
+    options.page_load_strategy = profile["page_load_strategy"]
+
+    # Налаштування для обходу анти-бот систем
+    options.add_argument(f"--user-agent={USER_AGENT}")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option("useAutomationExtension", False)
+
+    # Налаштування оптимізації
+    if headless:
+        prefs = {
+            "profile.managed_default_content_settings.images": 2
+        }  # Блокувати зображення в headless
+    else:
+        prefs = {
+            "profile.managed_default_content_settings.images": 1
+        }  # Дозволити зображення в non-headless
+    options.add_experimental_option("prefs", prefs)
+
+    # Постійна папка для профілю (щоб зберігати кукі, сесію тощо)
+    # Два браузери не можуть працювати з однією папкою профілю одночасно
+    profile_path = os.path.abspath(profile_dir)
+    if not os.path.exists(profile_path):
+        os.makedirs(profile_path)
+    options.add_argument(f"--user-data-dir={profile_path}")
+    options.add_argument(f"--disk-cache-size={DISK_CACHE_MB * 1024 * 1024}")
+
+    # Налаштування для "тихого" режиму
+    options.add_argument("--log-level=3")  # Показувати в логах тільки фатальні помилки
+    options.add_experimental_option(
+        "excludeSwitches", ["enable-logging"]
+    )  # Вимкнути логування DevTools
+
+    # Налаштування запуску
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-dev-shm-usage")
+
+    metrics.inc("browser_starts_total")
+    with metrics.timer("browser_start_seconds"):
+        try:
+            driver = _start_chrome(options, resolve_driver_path())
+        except Exception:
+            # Закешований chromedriver міг застаріти після оновлення Chrome
+            try:
+                driver = _start_chrome(options, resolve_driver_path(refresh=True))
+            except Exception as e:
+                raise RuntimeError(
+                    f"Не вдалося створити екземпляр Chrome драйвера: {e}"
+                )
+
+    # Блокуємо непотрібні ресурси на рівні мережі
+    if profile["blocked_urls"]:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": profile["blocked_urls"]}
+            )
+        except Exception:
+            pass  # Без блокування браузер все одно працездатний
+
+    # Запам'ятовуємо поточний таймаут, щоб не змінювати його зайвим запитом
+    driver.set_page_load_timeout(profile["page_load_timeout"])
+    driver.load_timeout = profile["page_load_timeout"]
+    return driver
+
+
+def _start_chrome(options, driver_path: str):
+    # Перенаправляємо вивід логів самого chromedriver.exe в "нікуди"
+    service = ChromeService(executable_path=driver_path, log_output=os.devnull)
+    driver = webdriver.Chrome(service=service, options=options)
+    pid = _driver_pid(driver)
+    if pid is not None:
+        with _spawned_lock:
+            _spawned_pids.add(pid)
+    driver.execute_script(
+        "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+    )
+    return driver
+
+
+class AdaptiveTimeout:
+    """
+    Таймаут, що підлаштовується під реальний час завантаження сторінок:
+    multiplier x ковзне середнє (EWMA), в межах [minimum, maximum].
+    """
+
+    def __init__(
+        self, initial: float, minimum: float, maximum: float, multiplier=4.0, alpha=0.2
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.alpha = alpha
+        self._average = initial / multiplier
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> float:
+        with self._lock:
+            timeout = self._average * self.multiplier
+        return min(self.maximum, max(self.minimum, timeout))
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._average += self.alpha * (seconds - self._average)
+
+
+def browser_rss_mb(driver) -> float:
+    """Сумарна пам'ять (RSS, МБ) chromedriver та всіх його дочірніх процесів Chrome."""
+    pid = _driver_pid(driver)
+    return tree_rss_mb(pid) if pid is not None else 0.0
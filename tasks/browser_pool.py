@@ -0,0 +1,223 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+from tasks.browser import (
+    browser_rss_mb,
+    cleanup_spawned_browsers,
+    create_browser,
+    quit_browser,
+)
+from tasks.profiles import ProfileManager, get_profile_manager
+
+# Значення за замовчуванням; воркер передає власні з config.py
+DEFAULT_POOL_SIZE = 2
+# Після скількох сторінок браузер перезапускається
+DEFAULT_MAX_PAGES = 200
+# Поріг пам'яті браузера (МБ), після якого він перезапускається
+DEFAULT_MAX_RSS_MB = 1500
+# Браузер, що простояв довше за цей час (с), перевіряється перед видачею
+HEALTHCHECK_IDLE = 30
+# Як часто (кожні N сторінок) перевіряти пам'ять браузера при поверненні в пул
+RSS_CHECK_PAGES = 10
+
+
+class BrowserLease:
+    """Браузер, виданий пулом. Власник може замінити driver (наприклад, після капчі)."""
+
+    def __init__(self, slot: int, driver=None):
+        self.slot = slot
+        # Папка профілю, закріплена за слотом менеджером профілів
+        self.profile_dir = None
+        self.driver = driver
+        self.pages = 0
+        self.last_used = time.monotonic()
+        # session_stamp() основного профілю на момент запуску браузера
+        self.session_stamp = 0.0
+
+
+class BrowserPool:
+    """
+    Пул "теплих" браузерів, які переживають окремі завдання.
+    Кожен слот отримує свій профіль від менеджера профілів, браузер створюється при першій
+    потребі або заздалегідь через warm_up, перевіряється після простою
+    і перезапускається після max_pages сторінок або перевищення max_rss_mb.
+    Коли в основному профілі з'являється нова сесія (вручну пройдено капчу,
+    зокрема в іншому процесі), браузери зі старою сесією перезапускаються
+    перед наступною видачею і отримують нові кукі.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        max_pages: int = DEFAULT_MAX_PAGES,
+        max_rss_mb: float = DEFAULT_MAX_RSS_MB,
+        factory=create_browser,
+        profiles: ProfileManager = None,
+    ):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.factory = factory
+        self.profiles = profiles or get_profile_manager()
+        self._free = [BrowserLease(slot) for slot in range(self.size)]
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def warm_up(self):
+        """Заздалегідь запускає браузери у вільних слотах."""
+        for _ in range(self.size):
+            with self._cond:
+                lease = next((l for l in self._free if l.driver is None), None)
+                if lease is None or self._closed:
+                    return
+                self._free.remove(lease)
+            try:
+                self._ensure_driver(lease)
+            except Exception:
+                pass  # Браузер буде створено пізніше при першому запиті
+            finally:
+                self.release(lease)
+
+    def acquire(self) -> BrowserLease:
+        """Видає вільний браузер, за потреби чекаючи, доки його повернуть."""
+        with self._cond:
+            while not self._free:
+                if self._closed:
+                    raise RuntimeError("Пул браузерів закрито.")
+                self._cond.wait()
+            if self._closed:
+                raise RuntimeError("Пул браузерів закрито.")
+            # Спершу віддаємо слоти з уже запущеним браузером
+            self._free.sort(key=lambda l: l.driver is None)
+            lease = self._free.pop(0)
+        try:
+            self._ensure_driver(lease)
+        except Exception:
+            self.release(lease)
+            raise
+        return lease
+
+    def release(self, lease: BrowserLease, broken: bool = False):
+        """Повертає браузер у пул; зламані або "зношені" браузери закриваються."""
+        if lease.driver is not None:
+            lease.last_used = time.monotonic()
+            if broken or self._closed or self._needs_recycle(lease):
+                if not self._closed:
+                    metrics.inc("browser_restarts_total")
+                self._quit(lease)
+                if self._closed:
+                    self._release_profile(lease)
+            # Відкриту сторінку не скидаємо: браузер повертається після кожного
+            # товару, а наступний driver.get однаково її замінить
+        with self._cond:
+            self._free.append(lease)
+            self._cond.notify()
+
+    @contextmanager
+    def borrow(self):
+        lease = self.acquire()
+        broken = False
+        try:
+            yield lease
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(lease, broken=broken)
+
+    def close(self):
+        """Закриває всі браузери в пулі."""
+        with self._cond:
+            self._closed = True
+            leases = list(self._free)
+            self._cond.notify_all()
+        for lease in leases:
+            self._quit(lease)
+            self._release_profile(lease)
+
+    def _ensure_driver(self, lease: BrowserLease):
+        if lease.driver is not None and not self._is_alive(lease):
+            self._quit(lease)
+        if (
+            lease.driver is not None
+            and lease.session_stamp < self.profiles.session_stamp()
+        ):
+            metrics.inc("browser_session_refreshes_total")
+            self._quit(lease)
+        if lease.driver is None:
+            if lease.profile_dir is None:
+                lease.profile_dir = self.profiles.acquire()
+            # Поки браузер закритий, чистимо профіль і підтягуємо свіжу сесію
+            lease.session_stamp = self.profiles.session_stamp()
+            self.profiles.prepare(lease.profile_dir)
+            lease.driver = self.factory(headless=True, profile_dir=lease.profile_dir)
+            lease.pages = 0
+
+    def _release_profile(self, lease: BrowserLease):
+        if lease.profile_dir is not None:
+            self.profiles.release(lease.profile_dir)
+            lease.profile_dir = None
+
+    def _is_alive(self, lease: BrowserLease) -> bool:
+        # Недавно використаний браузер вважаємо живим, щоб не робити зайвий запит
+        if time.monotonic() - lease.last_used < HEALTHCHECK_IDLE:
+            return True
+        try:
+            return bool(lease.driver.window_handles)
+        except Exception:
+            return False
+
+    def _needs_recycle(self, lease: BrowserLease) -> bool:
+        if lease.pages >= self.max_pages:
+            return True
+        # Обхід дерева процесів недешевий, тож пам'ять перевіряється не після кожної сторінки
+        if lease.pages % RSS_CHECK_PAGES:
+            return False
+        return browser_rss_mb(lease.driver) > self.max_rss_mb
+
+    @staticmethod
+    def _quit(lease: BrowserLease):
+        if lease.driver is not None:
+            quit_browser(lease.driver)
+        lease.driver = None
+        lease.pages = 0
+
+
+# --- ПУЛ НА РІВНІ ПРОЦЕСУ ---
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_browser_pool(
+    size: int = DEFAULT_POOL_SIZE,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    max_rss_mb: float = DEFAULT_MAX_RSS_MB,
+    warm: bool = True,
+) -> BrowserPool:
+    """Створює пул браузерів процесу і (за бажанням) прогріває його у фоні."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(size, max_pages, max_rss_mb)
+            if warm:
+                threading.Thread(
+                    target=_pool.warm_up, name="browser_pool_warmup", daemon=True
+                ).start()
+        return _pool
+
+
+def get_browser_pool() -> BrowserPool | None:
+    """Повертає пул браузерів процесу або None, якщо воркер його не запускав."""
+    return _pool
+
+
+def shutdown_browser_pool():
+    """Закриває пул браузерів процесу і добиває браузери, які ще не було закрито."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+    cleanup_spawned_browsers()
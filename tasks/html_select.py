@@ -0,0 +1,174 @@
+import re
+from html.parser import HTMLParser
+
+# Теги, які не мають закриваючого тегу
+VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+}
+# Теги, текст яких не є видимим вмістом сторінки
+SKIP_TEXT_TAGS = {"script", "style", "noscript", "template"}
+
+_COMPOUND_RE = re.compile(
+    r"(?P<tag>[a-zA-Z][\w-]*|\*)"
+    r"|#(?P<id>[\w-]+)"
+    r"|\.(?P<cls>[\w-]+)"
+    r"|\[\s*(?P<attr>[\w:-]+)\s*(?:=\s*(?:'(?P<q1>[^']*)'|\"(?P<q2>[^\"]*)\"|(?P<bare>[^\]\s]+))\s*)?\]"
+)
+
+
+class Element:
+    """Вузол спрощеного DOM-дерева."""
+
+    __slots__ = ("tag", "attrs", "children", "parent")
+
+    def __init__(self, tag: str, attrs: dict, parent: "Element | None" = None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []  # Element або str (текстові вузли)
+        self.parent = parent
+
+    def get(self, name: str) -> str | None:
+        return self.attrs.get(name)
+
+    @property
+    def text(self) -> str:
+        """Видимий текст елемента з нормалізованими пробілами (як .text у Selenium)."""
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif node.tag not in SKIP_TEXT_TAGS:
+                stack.extend(reversed(node.children))
+        return " ".join("".join(parts).split())
+
+    def iter(self):
+        """Обхід усіх нащадків у порядку документа."""
+        stack = list(reversed([c for c in self.children if isinstance(c, Element)]))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed([c for c in node.children if isinstance(c, Element)]))
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Element("#document", {})
+        self._current = self.root
+
+    def _append(self, tag, attrs) -> Element:
+        element = Element(tag, {k: v or "" for k, v in attrs}, self._current)
+        self._current.children.append(element)
+        return element
+
+    def handle_starttag(self, tag, attrs):
+        element = self._append(tag, attrs)
+        if tag not in VOID_TAGS:
+            self._current = element
+
+    def handle_startendtag(self, tag, attrs):
+        self._append(tag, attrs)
+
+    def handle_endtag(self, tag):
+        # Піднімаємось до найближчого відкритого тегу з такою назвою,
+        # щоб пережити незакриті теги у "брудному" HTML
+        node = self._current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self._current = node.parent
+
+    def handle_data(self, data):
+        self._current.children.append(data)
+
+
+def parse_html(html: str) -> Element:
+    """Розбирає HTML-рядок у спрощене DOM-дерево."""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def _parse_compound(part: str) -> list:
+    """Розбирає простий селектор виду tag#id.class[attr='value'] на список умов."""
+    conditions = []
+    pos = 0
+    while pos < len(part):
+        match = _COMPOUND_RE.match(part, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Непідтримуваний CSS-селектор: '{part}'")
+        pos = match.end()
+        if match.group("tag") and match.group("tag") != "*":
+            conditions.append(("tag", match.group("tag").lower()))
+        elif match.group("id"):
+            conditions.append(("attr", "id", match.group("id")))
+        elif match.group("cls"):
+            conditions.append(("class", match.group("cls")))
+        elif match.group("attr"):
+            value = next(
+                (v for v in match.group("q1", "q2", "bare") if v is not None), None
+            )
+            conditions.append(("attr", match.group("attr"), value))
+    return conditions
+
+
+def _matches(element: Element, conditions: list) -> bool:
+    for condition in conditions:
+        kind = condition[0]
+        if kind == "tag":
+            if element.tag != condition[1]:
+                return False
+        elif kind == "class":
+            if condition[1] not in element.attrs.get("class", "").split():
+                return False
+        else:
+            value = element.attrs.get(condition[1])
+            if value is None or (condition[2] is not None and value != condition[2]):
+                return False
+    return True
+
+
+def _has_ancestors(element: Element, chain: list) -> bool:
+    """Перевіряє, що предки елемента відповідають ланцюжку (комбінатор-нащадок)."""
+    node = element.parent
+    index = len(chain) - 1
+    while node is not None and index >= 0:
+        if _matches(node, chain[index]):
+            index -= 1
+        node = node.parent
+    return index < 0
+
+
+def select_all(root: Element, selector: str) -> list:
+    """Повертає всі елементи, що відповідають селектору, у порядку документа."""
+    chain = [_parse_compound(part) for part in selector.split()]
+    return [
+        element
+        for element in root.iter()
+        if _matches(element, chain[-1]) and _has_ancestors(element, chain[:-1])
+    ]
+
+
+def select_one(root: Element, selector: str) -> Element | None:
+    """Повертає перший елемент, що відповідає селектору, або None."""
+    chain = [_parse_compound(part) for part in selector.split()]
+    for element in root.iter():
+        if _matches(element, chain[-1]) and _has_ancestors(element, chain[:-1]):
+            return element
+    return None
@@ -0,0 +1,77 @@
+"""
+Порівнює профілі завантаження сторінок (LOAD_PROFILES) на наборі URL:
+скільки даних передано і скільки часу минуло до готовності сторінки.
+
+    python -m tasks.load_profile_report URL [URL ...] [--profiles full lean]
+"""
+
+import argparse
+import json
+import time
+
+from tasks.browser import LOAD_PROFILES, create_browser, quit_browser
+from tasks.prom_parser import _load_page, _read_browser_fields
+
+# Скільки секунд чекати після готовності сторінки, поки догрузяться ресурси
+SETTLE_TIME = 3
+
+# Сумарний обсяг, переданий мережею для документа та всіх його ресурсів
+TRANSFER_SIZE_JS = """
+return performance.getEntriesByType("navigation")
+    .concat(performance.getEntriesByType("resource"))
+    .reduce((total, entry) => total + (entry.transferSize || 0), 0);
+"""
+
+
+def measure_profile(load_profile: str, urls: list) -> dict:
+    """Відкриває всі URL в браузері з заданим профілем і повертає середні показники."""
+    driver = create_browser(
+        headless=True,
+        profile_dir=f"chrome_profile_report_{load_profile}",
+        load_profile=load_profile,
+    )
+    ready_times, transferred = [], []
+    try:
+        for url in urls:
+            started = time.monotonic()
+            not_before = _load_page(driver, url)
+            _read_browser_fields(driver, not_before)
+            ready_times.append(time.monotonic() - started)
+
+            time.sleep(SETTLE_TIME)
+            transferred.append(driver.execute_script(TRANSFER_SIZE_JS))
+    finally:
+        quit_browser(driver)
+
+    return {
+        "pages": len(urls),
+        "avg_ready_ms": round(1000 * sum(ready_times) / len(urls), 1),
+        "avg_transfer_kb": round(sum(transferred) / len(urls) / 1024, 1),
+    }
+
+
+def compare_profiles(urls: list, profiles: list) -> dict:
+    """Вимірює кожен профіль і рахує економію відносно першого з них."""
+    report = {profile: measure_profile(profile, urls) for profile in profiles}
+    baseline = report[profiles[0]]
+    for profile in profiles[1:]:
+        result = report[profile]
+        if baseline["avg_transfer_kb"]:
+            result["bytes_saved_pct"] = round(
+                100 * (1 - result["avg_transfer_kb"] / baseline["avg_transfer_kb"]), 1
+            )
+        if baseline["avg_ready_ms"]:
+            result["load_time_reduction_pct"] = round(
+                100 * (1 - result["avg_ready_ms"] / baseline["avg_ready_ms"]), 1
+            )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument(
+        "--profiles", nargs="+", default=["full", "lean"], choices=list(LOAD_PROFILES)
+    )
+    args = parser.parse_args()
+    print(json.dumps(compare_profiles(args.urls, args.profiles), indent=2))
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+# Файл архіву сторінок поруч з воркером
+PAGE_ARCHIVE_FILE = "page_archive.db"
+# Скільки днів зберігати знімки сторінок
+PAGE_ARCHIVE_DAYS = 30
+# Рівень стиснення zlib фрагментів сторінок
+PAGE_ARCHIVE_LEVEL = 9
+# Як часто (кожні N знімків) видаляти застарілі знімки
+PRUNE_EVERY = 500
+
+# Частини сторінки, які не потрібні для витягування полів товару
+_STRIP_RE = re.compile(
+    r"<(script|style|svg|noscript|template)\b.*?</\1\s*>"
+    r"|<!--.*?-->"
+    r"|<(?:link|meta)\b[^>]*>",
+    re.S | re.I,
+)
+_BODY_RE = re.compile(r"<body\b[^>]*>(.*)</body\s*>", re.S | re.I)
+_SPACE_RE = re.compile(r">\s+<")
+
+
+def page_fragment(html: str) -> str:
+    """
+    Фрагмент сторінки для архіву: вміст body без скриптів, стилів, svg,
+    коментарів і відступів між тегами. Уся розмітка лишається, тож поля
+    можна витягнути заново, навіть якщо селектори доведеться змінити.
+    """
+    body = _BODY_RE.search(html)
+    fragment = _STRIP_RE.sub("", body.group(1) if body else html)
+    return _SPACE_RE.sub("><", fragment).strip()
+
+
+class PageArchive:
+    """
+    Стиснений архів знімків сторінок товарів для повторного розбору без
+    завантаження (python -m tasks.prom_reparse). Фрагменти зберігаються
+    за хешем вмісту, тож незмінна сторінка, знята в різні дні, займає
+    місце один раз; кожен знімок - лише рядок з URL, часом і хешем.
+    """
+
+    def __init__(self, path: str, keep_days: float = PAGE_ARCHIVE_DAYS):
+        self.keep_days = keep_days
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fragments (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL
+            )
+            """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS captures (
+                url TEXT NOT NULL,
+                product_id INTEGER,
+                captured_at REAL NOT NULL,
+                source TEXT NOT NULL,
+                hash TEXT NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS captures_time ON captures (captured_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS captures_url ON captures (url, captured_at)"
+        )
+        self._conn.commit()
+
+    def put(self, url: str, html: str, product_id=None, source: str = "http"):
+        """Зберігає знімок сторінки (source - "http" або "browser")."""
+        fragment = page_fragment(html).encode("utf-8")
+        digest = hashlib.sha256(fragment).hexdigest()
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM fragments WHERE hash = ?", (digest,)
+            ).fetchone()
+            if exists is None:
+                self._conn.execute(
+                    "INSERT INTO fragments VALUES (?, ?, ?)",
+                    (
+                        digest,
+                        zlib.compress(fragment, PAGE_ARCHIVE_LEVEL),
+                        len(fragment),
+                    ),
+                )
+            self._add_capture(url, product_id, source, digest)
+
+    def repeat(self, url: str, product_id=None):
+        """Сторінка не змінилася (304): новий знімок посилається на останній фрагмент."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM captures WHERE url = ? ORDER BY captured_at DESC LIMIT 1",
+                (url,),
+            ).fetchone()
+            if row is not None:
+                self._add_capture(url, product_id, "not_modified", row[0])
+
+    def _add_capture(self, url: str, product_id, source: str, digest: str):
+        self._conn.execute(
+            "INSERT INTO captures VALUES (?, ?, ?, ?, ?)",
+            (url, product_id, time.time(), source, digest),
+        )
+        self._puts += 1
+        if self._puts % PRUNE_EVERY == 0:
+            self._prune()
+        self._conn.commit()
+
+    def _prune(self):
+        """Видаляє застарілі знімки і фрагменти, на які більше ніщо не посилається."""
+        self._conn.execute(
+            "DELETE FROM captures WHERE captured_at < ?",
+            (time.time() - self.keep_days * 24 * 3600,),
+        )
+        self._conn.execute(
+            "DELETE FROM fragments WHERE hash NOT IN (SELECT hash FROM captures)"
+        )
+
+    def latest(self, since: float = None, until: float = None):
+        """
+        Останній знімок кожного URL за проміжок [since, until]:
+        генератор (url, product_id, captured_at, html).
+        """
+        query = (
+            "SELECT c.url, c.product_id, MAX(c.captured_at), f.data FROM captures c "
+            "JOIN fragments f ON f.hash = c.hash "
+            "WHERE c.captured_at >= ? AND c.captured_at <= ? GROUP BY c.url"
+        )
+        with self._lock:
+            rows = self._conn.execute(
+                query, (since or 0, until or time.time())
+            ).fetchall()
+        for url, product_id, captured_at, data in rows:
+            yield url, product_id, captured_at, zlib.decompress(data).decode("utf-8")
+
+    def stats(self) -> dict:
+        with self._lock:
+            captures, fragments, raw, stored = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM captures), COUNT(*), "
+                "COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM fragments"
+            ).fetchone()
+        return {
+            "captures": captures,
+            "fragments": fragments,
+            "fragment_bytes": raw,
+            "stored_bytes": stored,
+        }
+
+
+# --- АРХІВ НА РІВНІ ПРОЦЕСУ ---
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def archive_path() -> str:
+    return os.path.join(os.path.dirname(sys.executable), PAGE_ARCHIVE_FILE)
+
+
+def get_page_archive() -> PageArchive:
+    """Повертає архів сторінок процесу, відкриваючи його при першому зверненні."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = PageArchive(archive_path())
+        return _archive
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Файл кешу сторінок поруч з воркером
+PAGE_CACHE_FILE = "page_cache.db"
+# Максимальна кількість сторінок у кеші (найдавніше використані видаляються)
+PAGE_CACHE_MAX_ENTRIES = 50000
+# Скільки секунд запис вважається актуальним без повного перезавантаження сторінки
+PAGE_CACHE_TTL = 3 * 24 * 3600
+# Як часто (кожні N записів) перевіряти розмір кешу
+EVICT_EVERY = 100
+
+
+def fields_hash(fields: dict) -> str:
+    """Хеш витягнутих з фрагмента сторінки полів."""
+    data = json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+class PageCache:
+    """
+    Кеш сторінок товарів за URL: валідатори умовних запитів (ETag,
+    Last-Modified), хеш витягнутих полів і самі поля. Обмежений за
+    кількістю записів (LRU) і за часом життя запису (TTL).
+    Лічильники stats показують, скільки товарів обійшлися без завантаження.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = PAGE_CACHE_MAX_ENTRIES,
+        ttl: float = PAGE_CACHE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = {"not_modified": 0, "unchanged": 0, "changed": 0, "new": 0}
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                fields_hash TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used)"
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> dict | None:
+        """Повертає актуальний запис для URL або None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, fields_hash, fields, fetched_at FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None or time.time() - row[4] > self.ttl:
+            return None
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "fields_hash": row[2],
+            "fields": json.loads(row[3]),
+        }
+
+    @staticmethod
+    def conditional_headers(entry: dict | None) -> dict:
+        """Заголовки умовного запиту для запису кешу."""
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def hit(self, url: str):
+        """Сервер відповів 304: сторінка не змінилася з моменту кешування."""
+        with self._lock:
+            self.stats["not_modified"] += 1
+            self._conn.execute(
+                "UPDATE pages SET last_used = ? WHERE url = ?", (time.time(), url)
+            )
+            self._conn.commit()
+
+    def put(self, url: str, fields: dict, etag: str = None, last_modified: str = None):
+        """Зберігає свіжо завантажені поля сторінки і рахує, чи вони змінилися."""
+        new_hash = fields_hash(fields)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fields_hash FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.stats["new"] += 1
+            elif row[0] == new_hash:
+                self.stats["unchanged"] += 1
+            else:
+                self.stats["changed"] += 1
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    etag,
+                    last_modified,
+                    new_hash,
+                    json.dumps(fields, ensure_ascii=False),
+                    now,
+                    now,
+                ),
+            )
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Видаляє найдавніше використані записи понад max_entries."""
+        count = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM pages WHERE url IN "
+                "(SELECT url FROM pages ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+# --- КЕШ НА РІВНІ ПРОЦЕСУ ---
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    """Повертає кеш сторінок процесу, відкриваючи його при першому зверненні."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = os.path.join(os.path.dirname(sys.executable), PAGE_CACHE_FILE)
+            _cache = PageCache(path)
+        return _cache
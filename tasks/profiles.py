@@ -0,0 +1,278 @@
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import psutil
+
+import metrics
+
+# Основний профіль: у ньому вручну проходиться капча, з нього беруться кукі
+MASTER_PROFILE_DIR = "chrome_profile"
+# Папка з "легкими" профілями окремих браузерів (shard_0, shard_1, ...)
+PROFILES_DIR = "chrome_profiles"
+# Файли і папки основного профілю, які копіюються в профілі браузерів:
+# ключ шифрування кукі (Local State), кукі та localStorage
+PROFILE_SYNC_PATHS = (
+    "Local State",
+    "Default/Network/Cookies",
+    "Default/Network/Cookies-journal",
+    "Default/Cookies",
+    "Default/Local Storage",
+)
+# Кукі основного профілю: їхня зміна означає нову сесію (наприклад, пройдену капчу)
+SESSION_PATHS = ("Default/Network/Cookies", "Default/Cookies")
+# Кеші та історія, які можна видаляти без втрати сесії
+PROFILE_PRUNE_PATHS = (
+    "Default/Cache",
+    "Default/Code Cache",
+    "Default/GPUCache",
+    "Default/DawnCache",
+    "Default/DawnGraphiteCache",
+    "Default/Service Worker/CacheStorage",
+    "Default/Service Worker/ScriptCache",
+    "Default/History",
+    "Default/History-journal",
+    "GrShaderCache",
+    "GraphiteDawnCache",
+    "ShaderCache",
+)
+# Бюджет розміру одного профілю в МБ: більший профіль чиститься від кешів,
+# а якщо не допомогло - створюється заново з основного
+PROFILE_MAX_MB = 300
+# Як часто (с) перевіряти, чи звільнився основний профіль
+MASTER_WAIT_INTERVAL = 1.0
+# Скільки секунд чекати на основний профіль для синхронізації (інші процеси
+# синхронізуються швидко, а ручна капча триває довше - тоді синхронізація пропускається)
+SYNC_WAIT = 5
+# Скільки секунд порожній lock-файл вважається таким, що ще записується
+LOCK_WRITE_GRACE = 10
+# Файл у профілі браузера з часом змін скопійованих файлів основного профілю
+_SYNC_STAMP_FILE = "hive_sync.json"
+
+
+def _dir_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total / (1024 * 1024)
+
+
+def _mtime(path: str) -> float | None:
+    """Час останньої зміни файлу або найновішого файлу в папці."""
+    if os.path.isfile(path):
+        return os.path.getmtime(path)
+    if not os.path.isdir(path):
+        return None
+    newest = os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+            except OSError:
+                pass
+    return newest
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ProfileManager:
+    """
+    Видає кожному одночасно запущеному браузеру власну папку профілю
+    (Chrome блокує профіль, тож один профіль не може бути в двох браузерах).
+    Папки закріплюються lock-файлами з PID, тому профілі не перетинаються
+    і між процесами завдань. Перед запуском браузера в профіль копіюються
+    кукі та localStorage з основного профілю (там, де вручну пройдено капчу),
+    а кеші профілю обрізаються за бюджетом розміру.
+    """
+
+    def __init__(
+        self,
+        master_dir: str = MASTER_PROFILE_DIR,
+        profiles_dir: str = PROFILES_DIR,
+        max_mb: float = PROFILE_MAX_MB,
+    ):
+        self.master_dir = os.path.abspath(master_dir)
+        self.profiles_dir = os.path.abspath(profiles_dir)
+        self.max_mb = max_mb
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> str:
+        """Закріплює за браузером перший вільний профіль і повертає шлях до нього."""
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        index = 0
+        while True:
+            path = os.path.join(self.profiles_dir, f"shard_{index}")
+            if self._try_lock(path):
+                return path
+            index += 1
+
+    def release(self, path: str):
+        """Звільняє профіль (браузер у ньому вже має бути закритий)."""
+        with self._lock:
+            self._held.discard(path)
+        try:
+            os.remove(path + ".lock")
+        except OSError:
+            pass
+
+    def prepare(self, path: str):
+        """Готує профіль до запуску браузера: чистить кеші і синхронізує сесію."""
+        os.makedirs(path, exist_ok=True)
+        self.prune(path)
+        self.sync(path)
+
+    def prune(self, path: str):
+        """Обрізає профіль за бюджетом розміру."""
+        if _dir_size_mb(path) <= self.max_mb:
+            return
+        for relative in PROFILE_PRUNE_PATHS:
+            _remove(os.path.join(path, relative))
+        metrics.inc("profile_prunes_total")
+        if path != self.master_dir and _dir_size_mb(path) > self.max_mb:
+            # Профіль браузера нічого не втрачає: сесія знову прийде з основного
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path, exist_ok=True)
+            metrics.inc("profile_resets_total")
+
+    def sync(self, path: str):
+        """
+        Копіює в профіль кукі та localStorage основного профілю, якщо вони
+        змінилися з попередньої синхронізації. Поки основний профіль відкрито
+        для ручної капчі, синхронізація пропускається.
+        """
+        if not os.path.isdir(self.master_dir) or not self._wait_lock(
+            self.master_dir, SYNC_WAIT
+        ):
+            return
+        try:
+            stamp_path = os.path.join(path, _SYNC_STAMP_FILE)
+            try:
+                with open(stamp_path, encoding="utf-8") as f:
+                    stamps = json.load(f)
+            except (OSError, ValueError):
+                stamps = {}
+
+            changed = False
+            for relative in PROFILE_SYNC_PATHS:
+                source = os.path.join(self.master_dir, relative)
+                mtime = _mtime(source)
+                target = os.path.join(path, relative)
+                if mtime is None or (
+                    stamps.get(relative) == mtime and os.path.exists(target)
+                ):
+                    continue
+                _remove(target)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    if os.path.isdir(source):
+                        shutil.copytree(source, target)
+                    else:
+                        shutil.copy2(source, target)
+                except OSError:
+                    continue  # Файл зайнятий - скопіюємо наступного разу
+                stamps[relative] = mtime
+                changed = True
+
+            if changed:
+                with open(stamp_path, "w", encoding="utf-8") as f:
+                    json.dump(stamps, f)
+                metrics.inc("profile_syncs_total")
+        finally:
+            self.release(self.master_dir)
+
+    def session_stamp(self) -> float:
+        """
+        Час останньої зміни кукі основного профілю (0 - кукі немає). Браузер,
+        запущений до цього моменту, ще не має сесії, у якій пройдено капчу.
+        """
+        stamps = []
+        for relative in SESSION_PATHS:
+            try:
+                stamps.append(os.path.getmtime(os.path.join(self.master_dir, relative)))
+            except OSError:
+                pass
+        return max(stamps, default=0.0)
+
+    @contextmanager
+    def master(self):
+        """
+        Відкриває основний профіль для видимого браузера (ручна капча),
+        чекаючи, поки його звільнить інший потік чи процес.
+        """
+        os.makedirs(self.master_dir, exist_ok=True)
+        self._wait_lock(self.master_dir)
+        try:
+            self.prune(self.master_dir)
+            yield self.master_dir
+        finally:
+            self.release(self.master_dir)
+
+    def _wait_lock(self, path: str, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._try_lock(path):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(MASTER_WAIT_INTERVAL)
+        return True
+
+    def _try_lock(self, path: str) -> bool:
+        with self._lock:
+            if path in self._held:
+                return False
+            lock_path = path + ".lock"
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._is_stale(lock_path):
+                    return False
+                # Процес, що тримав профіль, завершився - забираємо профіль
+                try:
+                    os.remove(lock_path)
+                    fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except OSError:
+                    return False
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            self._held.add(path)
+            return True
+
+    @staticmethod
+    def _is_stale(lock_path: str) -> bool:
+        try:
+            with open(lock_path, encoding="utf-8") as f:
+                pid = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return False
+        if not pid:
+            # Файл щойно створено і ще не записано (або процес упав саме в цей момент)
+            return time.time() - os.path.getmtime(lock_path) > LOCK_WRITE_GRACE
+        return pid != os.getpid() and not psutil.pid_exists(pid)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_profile_manager() -> ProfileManager:
+    """Менеджер профілів процесу."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ProfileManager()
+        return _manager
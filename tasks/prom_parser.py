@@ -1,15 +1,30 @@
 import re
+import threading
 import time
-import psutil
-import os
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+import metrics
+from tasks.browser import (
+    LOAD_PROFILE,
+    LOAD_PROFILES,
+    USER_AGENT,
+    AdaptiveTimeout,
+    create_browser,
+    quit_browser,
+)
+from tasks.browser_pool import BrowserPool, get_browser_pool
+from tasks.html_select import parse_html, select_one
+from tasks.page_archive import PageArchive, get_page_archive
+from tasks.page_cache import PageCache, get_page_cache
+from tasks.profiles import get_profile_manager
+from tasks.rate_limit import AdaptiveRateLimiter
+
 # --- КОНФІГУРАЦІЯ СЕЛЕКТОРІВ ---
 MAIN_INFO_BLOCK_SELECTOR = "div[data-qaid='main_product_info']"
 PRICE_SELECTOR = "div[data-qaid='product_price']"
@@ -20,6 +35,110 @@ PAGE_NOT_FOUND_SELECTOR = "span[data-qaid='page_not_found_title']"
 DELETED_WARNING_PANEL_SELECTOR = "div[data-qaid='warning_panel']"
 CAPTCHA_SELECTOR = "div.g-recaptcha"  # Селектор для виявлення reCAPTCHA
 
+# --- НАЛАШТУВАННЯ HTTP-ПАРСИНГУ ---
+# Спершу пробувати отримати сторінку звичайним HTTP-запитом, а браузер
+# запускати лише для сторінок з капчею або без ключових елементів
+HTTP_FIRST = True
+# Таймаут HTTP-запиту сторінки товару в секундах
+HTTP_TIMEOUT = 15
+# Кількість з'єднань, які пул HTTP-сесії тримає відкритими для одного хоста
+HTTP_POOL_SIZE = 10
+# Зберігати сторінки між запусками і питати сервер, чи змінилися вони
+# (If-None-Match / If-Modified-Since); незмінені товари беруться з кешу
+PAGE_CACHE = True
+# Зберігати фрагменти завантажених сторінок у стиснений архів, щоб після зміни
+# розмітки сайту розібрати їх заново без повторного збору (tasks/prom_reparse.py)
+PAGE_ARCHIVE = False
+
+# --- НАЛАШТУВАННЯ ПАРАЛЕЛЬНОСТІ ---
+# Скільки товарів обробляється одночасно (браузери потоки беруть з пулу)
+CONCURRENCY = 4
+# Початковий інтервал між запитами до одного хоста в секундах (спільний для всіх потоків).
+# Далі частота підбирається автоматично: росте, поки сайт відповідає нормально,
+# і падає вдвічі після капчі, 429/503 або різкого уповільнення відповідей
+REQUEST_INTERVAL = 1.0
+# Межі адаптивного інтервалу між запитами в секундах
+REQUEST_INTERVAL_MIN = 0.2
+REQUEST_INTERVAL_MAX = 10.0
+# Коди відповіді, якими сайт просить зменшити частоту запитів
+THROTTLE_STATUS_CODES = (429, 503)
+
+# --- КАПЧА ---
+# "manual" - товари з капчею відкладаються, а після решти пакета капча
+# проходиться вручну в одному видимому браузері;
+# "defer" - ручного режиму немає, товари з капчею повертаються зі статусом 5
+CAPTCHA_MODE = "manual"
+
+# --- ЧАСОВИЙ БЮДЖЕТ ПАКЕТА ---
+# Скільки секунд може тривати один пакет (0 - без обмеження). Товари, які не
+# встигли обробити, повертаються серверу як продовження завдання, тож вмикати
+# лише з сервером, що приймає continuation (сервер може передати time_budget сам)
+TIME_BUDGET = 0
+# Скільки останніх вимірів часу товару потрібно, щоб заздалегідь оцінити,
+# скільки товарів встигне оброблятися за бюджет
+BUDGET_MIN_SAMPLES = 20
+
+# --- ВИТЯГУВАННЯ ДАНИХ У БРАУЗЕРІ ---
+# Скільки секунд чекати, поки на сторінці з'явиться статус, капча, панель
+# видаленого товару або заголовок 404
+PAGE_READY_TIMEOUT = 5
+# Нижня межа адаптивного таймауту завантаження сторінки в секундах (верхня -
+# page_load_timeout профілю завантаження LOAD_PROFILE з tasks/browser.py)
+PAGE_LOAD_TIMEOUT_MIN = 10
+
+# Скрипт виконується в браузері одним запитом до chromedriver: чекає на
+# готовність сторінки і повертає ті самі поля, що й extract_page_fields
+EXTRACT_FIELDS_JS = """
+const selectors = arguments[0];
+const timeoutMs = arguments[1];
+const notBefore = arguments[2];
+const done = arguments[arguments.length - 1];
+const find = (selector, root) => (root || document).querySelector(selector);
+const text = (el) => (el ? (el.innerText || el.textContent || "").trim() : null);
+// Документ має бути відкритий після виклику driver.get, а не лишитися від попереднього товару
+const isFresh = () => performance.timeOrigin >= notBefore - 50;
+const isReady = () =>
+    isFresh() && (find(selectors.captcha) || find(selectors.deleted) ||
+    find(selectors.status) || find(selectors.not_found));
+const collect = () => {
+    if (!isFresh()) {
+        return {
+            captcha: false, deleted: false, not_found: false, has_main_block: false,
+            status_text: null, price: null, orders_text: null, rating: null,
+        };
+    }
+    const main = find(selectors.main);
+    const price = main ? find(selectors.price, main) : null;
+    const orders = main ? find(selectors.orders, main) : null;
+    const rating = find(selectors.rating);
+    return {
+        captcha: !!find(selectors.captcha),
+        deleted: !!find(selectors.deleted),
+        not_found: !!find(selectors.not_found),
+        has_main_block: !!main,
+        status_text: text(find(selectors.status)),
+        price: price ? price.getAttribute("data-qaprice") : null,
+        orders_text: text(orders),
+        rating: rating ? rating.getAttribute("data-qarating") : null,
+    };
+};
+const started = Date.now();
+(function poll() {
+    if (isReady() || Date.now() - started >= timeoutMs) {
+        done(collect());
+    } else {
+        setTimeout(poll, 50);
+    }
+})();
+"""
+
+# Спільний для всіх браузерів процесу таймаут завантаження сторінки: починається
+# з таймауту профілю, з яким створюються headless-браузери, і не перевищує його
+_PROFILE_LOAD_TIMEOUT = LOAD_PROFILES[LOAD_PROFILE]["page_load_timeout"]
+_PAGE_LOAD_TIMEOUT = AdaptiveTimeout(
+    _PROFILE_LOAD_TIMEOUT, PAGE_LOAD_TIMEOUT_MIN, _PROFILE_LOAD_TIMEOUT
+)
+
 # --- СЛОВНИК СТАТУСІВ ---
 STATUS_MAP = {
     "Недоступний": 0,
@@ -41,125 +160,291 @@ def _extract_number(text: str) -> int | None:
     return int(match.group(1)) if match else None
 
 
-def safe_cleanup_processes():
-    """Безпечно завершує залишкові процеси від попередніх запусків Selenium."""
-    for proc in psutil.process_iter(["pid", "name", "cmdline"]):
-        try:
-            proc_name = proc.info["name"]
-            if proc_name == "chromedriver.exe":
-                proc.kill()
-            elif (
-                proc_name == "chrome.exe"
-                and proc.info["cmdline"]
-                and any(
-                    "--remote-debugging-port" in arg for arg in proc.info["cmdline"]
-                )
-            ):
-                proc.kill()
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
+def create_http_session(pool_size: int = HTTP_POOL_SIZE) -> requests.Session:
+    """Створює HTTP-сесію з пулом keep-alive з'єднань і заголовками як у браузера."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(
+        {
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "uk-UA,uk;q=0.9,ru;q=0.8",
+        }
+    )
+    return session
+
+
+def extract_page_fields(html: str) -> dict:
+    """
+    Витягує сирі поля товару зі статичного HTML сторінки.
+    Повертає ті самі ключі, що й браузерний шлях, щоб обидва джерела
+    оброблялися однаково в _build_daily_data.
+    """
+    root = parse_html(html)
+    fields = {
+        "captcha": select_one(root, CAPTCHA_SELECTOR) is not None,
+        "deleted": select_one(root, DELETED_WARNING_PANEL_SELECTOR) is not None,
+        "not_found": select_one(root, PAGE_NOT_FOUND_SELECTOR) is not None,
+        "has_main_block": False,
+        "status_text": None,
+        "price": None,
+        "orders_text": None,
+        "rating": None,
+    }
+
+    status_element = select_one(root, STATUS_SELECTOR)
+    if status_element is not None:
+        fields["status_text"] = status_element.text
+
+    main_info_block = select_one(root, MAIN_INFO_BLOCK_SELECTOR)
+    if main_info_block is not None:
+        fields["has_main_block"] = True
+        price_element = select_one(main_info_block, PRICE_SELECTOR)
+        if price_element is not None:
+            fields["price"] = price_element.get("data-qaprice")
+        orders_element = select_one(main_info_block, ORDER_COUNTER_SELECTOR)
+        if orders_element is not None:
+            fields["orders_text"] = orders_element.text
+
+    rating_element = select_one(root, RATING_SELECTOR)
+    if rating_element is not None:
+        fields["rating"] = rating_element.get("data-qarating")
+
+    return fields
+
+
+def _is_complete(fields: dict) -> bool:
+    """Чи достатньо полів для результату без браузера (немає капчі і є ключові маркери)."""
+    if fields["captcha"]:
+        return False
+    if fields["deleted"] or fields["not_found"]:
+        return True
+    return fields["has_main_block"] and fields["status_text"] is not None
+
+
+def fetch_page_fields(
+    session: requests.Session,
+    product_url: str,
+    cache: PageCache = None,
+    limiter: AdaptiveRateLimiter = None,
+    archive: PageArchive = None,
+    product_id=None,
+) -> dict | None:
+    """
+    Завантажує сторінку товару звичайним HTTP-запитом і витягує поля.
+    Повертає None, якщо сторінку треба відкрити в браузері (капча,
+    неочікувана відповідь сервера або відсутні ключові елементи).
+    З cache запит умовний: на 304 повертаються поля з кешу.
+    limiter отримує зворотний зв'язок про відповідь сайту.
+    archive зберігає знімок кожної отриманої сторінки (навіть неповної).
+    """
+    entry = cache.get(product_url) if cache else None
+    started = time.monotonic()
+    try:
+        response = session.get(
+            product_url,
+            headers=PageCache.conditional_headers(entry),
+            timeout=HTTP_TIMEOUT,
+        )
+    except requests.exceptions.Timeout:
+        metrics.inc("http_errors_total")
+        if limiter:
+            limiter.record(product_url, throttled=True)
+        return None
+    except requests.exceptions.RequestException:
+        metrics.inc("http_errors_total")
+        return None
+    elapsed = time.monotonic() - started
+    metrics.observe("http_fetch_seconds", elapsed)
+
+    if response.status_code == 304 and entry:
+        metrics.inc("page_cache_hits_total")
+        if limiter:
+            limiter.record(product_url, throttled=False)
+        cache.hit(product_url)
+        if archive:
+            archive.repeat(product_url, product_id)
+        return entry["fields"]
+
+    if response.status_code in THROTTLE_STATUS_CODES:
+        metrics.inc("http_throttled_total")
+        if limiter:
+            limiter.record(product_url, throttled=True)
+        return None
+
+    # 404 віддає сторінку з PAGE_NOT_FOUND_SELECTOR, інші помилки - в браузер
+    if response.status_code not in (200, 404):
+        return None
 
+    html = response.content.decode("utf-8", errors="replace")
+    with metrics.timer("http_extract_seconds"):
+        fields = extract_page_fields(html)
+    if archive:
+        archive.put(product_url, html, product_id)
+    if limiter:
+        limiter.record(product_url, throttled=fields["captcha"], elapsed=elapsed)
+    if not _is_complete(fields):
+        return None
+    if cache:
+        cache.put(
+            product_url,
+            fields,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+    return fields
+
+
+def _build_daily_data(product_id, fields: dict) -> dict:
+    """Перетворює сирі поля сторінки на запис daily_data для сервера."""
+    daily_data = {
+        "product_id": product_id,
+        "status_id": None,
+        "price": None,
+        "order_quantity": None,
+        "rating": None,
+    }
+
+    # Видалений товар - статус 4, решту полів не заповнюємо
+    if fields["deleted"]:
+        daily_data["status_id"] = 4
+        return daily_data
+
+    # Парсимо статус, а якщо його немає - перевіряємо чи сторінка 404
+    if fields["status_text"] is not None:
+        for text_key, status_id in STATUS_MAP.items():
+            if text_key in fields["status_text"]:
+                daily_data["status_id"] = status_id
+                break
+    elif fields["not_found"]:
+        daily_data["status_id"] = 0
+
+    # Парсимо ціну
+    try:
+        daily_data["price"] = float(fields["price"])
+    except (TypeError, ValueError):
+        pass
 
-def create_browser(headless=True):
-    """Створює екземпляр Chrome з налаштуваннями для тихої та ефективної роботи."""
-    options = webdriver.ChromeOptions()
-
-    # Налаштування для обходу анти-бот систем
-    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
-    options.add_argument(f"--user-agent={user_agent}")
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option("useAutomationExtension", False)
-
-    # Налаштування оптимізації
-    if headless:
-        prefs = {
-            "profile.managed_default_content_settings.images": 2
-        }  # Блокувати зображення в headless
-    else:
-        prefs = {
-            "profile.managed_default_content_settings.images": 1
-        }  # Дозволити зображення в non-headless
-    options.add_experimental_option("prefs", prefs)
-
-    # Постійна папка для профілю (щоб зберігати кукі, сесію тощо)
-    profile_path = os.path.abspath("chrome_profile")
-    if not os.path.exists(profile_path):
-        os.makedirs(profile_path)
-    options.add_argument(f"--user-data-dir={profile_path}")
-
-    # Налаштування для "тихого" режиму
-    options.add_argument("--log-level=3")  # Показувати в логах тільки фатальні помилки
-    options.add_experimental_option(
-        "excludeSwitches", ["enable-logging"]
-    )  # Вимкнути логування DevTools
-
-    # Налаштування запуску
-    if headless:
-        options.add_argument("--headless")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-dev-shm-usage")
+    # Парсимо кількість замовлень
+    daily_data["order_quantity"] = _extract_number(fields["orders_text"])
 
+    # Парсимо рейтинг
     try:
-        # Перенаправляємо вивід логів самого chromedriver.exe в "нікуди"
-        service = ChromeService(
-            executable_path=ChromeDriverManager().install(), log_output=os.devnull
-        )
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.execute_script(
-            "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
-        )
-    except Exception as e:
-        raise RuntimeError(f"Не вдалося створити екземпляр Chrome драйвера: {e}")
+        daily_data["rating"] = float(fields["rating"])
+    except (TypeError, ValueError):
+        pass
+
+    if daily_data.get("status_id") is None:
+        daily_data["status_id"] = 5
 
-    driver.set_page_load_timeout(300)
-    return driver
+    return daily_data
 
 
-def parse_product_data(products_to_scrape: list) -> str:
-    """Основна функція для парсингу списку товарів."""
-    scraped_data = []
-    driver = None
+def _sync_cookies(driver, session: requests.Session):
+    """Переносить кукі з браузера в HTTP-сесію (наприклад, після проходження капчі)."""
     try:
-        driver = create_browser(headless=True)
-        for product in products_to_scrape:
-            product_id = product.get("product_id")
-            product_url = product.get("url")
-
-            if not all([product_id, product_url]):
-                continue
-
-            daily_data = {
-                "product_id": product_id,
-                "status_id": None,
-                "price": None,
-                "order_quantity": None,
-                "rating": None,
-            }
-
-            def load_and_check_captcha():
-                driver.get(product_url)
-                # --- Виявлення капчі ---
-                try:
-                    WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located(
-                            (By.CSS_SELECTOR, CAPTCHA_SELECTOR)
-                        )
-                    )
-                    return True  # Капча виявлена
-                except TimeoutException:
-                    return False  # Капчі немає
+        for cookie in driver.get_cookies():
+            session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain"),
+                path=cookie.get("path", "/"),
+            )
+    except Exception:
+        pass
+
+
+def _load_page(driver, product_url: str) -> float:
+    """
+    Відкриває сторінку з адаптивним таймаутом. Якщо сторінка не встигла
+    завантажитися, зупиняє завантаження і працює з тим, що вже є в DOM.
+    Повертає час початку навігації (epoch, мс) для перевірки свіжості документа.
+    """
+    timeout = round(_PAGE_LOAD_TIMEOUT.value)
+    if getattr(driver, "load_timeout", None) != timeout:
+        driver.set_page_load_timeout(timeout)
+        driver.load_timeout = timeout
+
+    not_before = time.time() * 1000
+    started = time.monotonic()
+    try:
+        driver.get(product_url)
+        elapsed = time.monotonic() - started
+        _PAGE_LOAD_TIMEOUT.observe(elapsed)
+        metrics.observe("page_load_seconds", elapsed)
+    except TimeoutException:
+        _PAGE_LOAD_TIMEOUT.observe(timeout)
+        metrics.inc("page_load_timeouts_total")
+        metrics.observe("page_load_seconds", time.monotonic() - started)
+        try:
+            driver.execute_script("window.stop();")
+        except Exception:
+            pass
+    return not_before
+
+
+def _read_browser_fields(driver, not_before: float = 0) -> dict:
+    """
+    Збирає сирі поля з завантаженої в браузері сторінки одним викликом
+    execute_async_script: скрипт сам чекає на готовність сторінки
+    і повертає всі поля разом.
+    """
+    selectors = {
+        "captcha": CAPTCHA_SELECTOR,
+        "deleted": DELETED_WARNING_PANEL_SELECTOR,
+        "not_found": PAGE_NOT_FOUND_SELECTOR,
+        "status": STATUS_SELECTOR,
+        "main": MAIN_INFO_BLOCK_SELECTOR,
+        "price": PRICE_SELECTOR,
+        "orders": ORDER_COUNTER_SELECTOR,
+        "rating": RATING_SELECTOR,
+    }
+    with metrics.timer("browser_extract_seconds"):
+        return driver.execute_async_script(
+            EXTRACT_FIELDS_JS, selectors, PAGE_READY_TIMEOUT * 1000, not_before
+        )
+
 
-            captcha_detected = load_and_check_captcha()
+# Одночасно користувачу показується лише одне вікно для ручного проходження капчі
+# (між процесами завдань це гарантує блокування основного профілю)
+_MANUAL_CAPTCHA_LOCK = threading.Lock()
 
-            if captcha_detected:
-                print("Капча виявлена. Перемикаємося на ручний режим.")
-                driver.quit()
 
-                # Відкриваємо не-headless браузер для ручного проходження капчі
-                manual_driver = create_browser(headless=False)
+def _archive_browser_page(archive: PageArchive, driver, product_url: str, product_id):
+    try:
+        archive.put(product_url, driver.page_source, product_id, source="browser")
+    except Exception:
+        pass  # Знімок не обов'язковий для результату
+
+
+def _scrape_with_browser(lease, product_url: str, solve_captcha: bool = True) -> dict:
+    """
+    Відкриває сторінку в браузері пулу (з ручним проходженням капчі, якщо solve_captcha).
+    Капча проходиться в основному профілі; після неї браузер перестворюється
+    з сесією, скопійованою з основного профілю, і новий драйвер записується в lease.
+    Якщо капчу не пройдено за відведений час, повертаються поля сторінки з капчею.
+    """
+    driver = lease.driver
+    profile_dir = lease.profile_dir
+    profiles = get_profile_manager()
+    lease.pages += 1
+
+    not_before = _load_page(driver, product_url)
+    fields = _read_browser_fields(driver, not_before)
+
+    if fields["captcha"] and solve_captcha:
+        print("Капча виявлена. Перемикаємося на ручний режим.")
+        quit_browser(driver)
+
+        metrics.inc("manual_captcha_total")
+        with _MANUAL_CAPTCHA_LOCK, profiles.master() as master_dir, metrics.timer(
+            "manual_captcha_seconds"
+        ):
+            # Відкриваємо не-headless браузер для ручного проходження капчі
+            manual_driver = create_browser(headless=False, profile_dir=master_dir)
+            try:
                 manual_driver.get(product_url)
 
                 # Чекаємо, поки капча зникне (користувач пройде її, і сторінка оновиться)
@@ -179,91 +464,258 @@ def parse_product_data(products_to_scrape: list) -> str:
                     )
                 except TimeoutException:
                     pass  # Якщо не з'явиться, все одно продовжуємо
-
-                manual_driver.quit()
-
-                # Перезапускаємо headless браузер з тією ж сесією
-                driver = create_browser(headless=True)
-
-                # Повторно завантажуємо сторінку (тепер з пройденою капчею)
-                driver.get(product_url)
-
-            # Шукаємо елемент для видаленого товару, і якщо такий є, ставимо статус 4
-            try:
-                driver.find_element(By.CSS_SELECTOR, DELETED_WARNING_PANEL_SELECTOR)
-                daily_data["status_id"] = 4
-                scraped_data.append(daily_data)
-                time.sleep(1)
-                continue
-            except NoSuchElementException:
-                pass
-
-            # Чекаємо 5 секунд на завантаження сторінки, якщо вона не завантажилася, перевіряємо чи сторінка 404
-            try:
-                wait = WebDriverWait(driver, 5)
-                status_element = wait.until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, STATUS_SELECTOR))
-                )
-                # Парсимо статус
-                status_text = status_element.text
-                for text_key, status_id in STATUS_MAP.items():
-                    if text_key in status_text:
-                        daily_data["status_id"] = status_id
-                        break
+                solved = True
             except TimeoutException:
-                try:
-                    driver.find_element(By.CSS_SELECTOR, PAGE_NOT_FOUND_SELECTOR)
-                    daily_data["status_id"] = 0
-                except NoSuchElementException:
-                    pass
-
-            # Шукаємо елементи інформації про товар
-            try:
-                main_info_block = driver.find_element(
-                    By.CSS_SELECTOR, MAIN_INFO_BLOCK_SELECTOR
-                )
-                # Парсимо ціну
-                try:
-                    price_element = main_info_block.find_element(
-                        By.CSS_SELECTOR, PRICE_SELECTOR
+                # Капчу ніхто не пройшов (воркер працює без нагляду)
+                metrics.inc("manual_captcha_timeouts_total")
+                solved = False
+            finally:
+                quit_browser(manual_driver)
+
+        # Перезапускаємо headless браузер з сесією, у якій пройдено капчу
+        # (решту браузерів пулу перезапустить сам пул, побачивши нову сесію)
+        lease.session_stamp = profiles.session_stamp()
+        profiles.prepare(profile_dir)
+        driver = create_browser(headless=True, profile_dir=profile_dir)
+        lease.driver = driver
+        if not solved:
+            return fields
+
+        # Повторно завантажуємо сторінку (тепер з пройденою капчею)
+        not_before = _load_page(driver, product_url)
+        fields = _read_browser_fields(driver, not_before)
+
+    return fields
+
+
+def _deferred_daily_data(product_id) -> dict:
+    """daily_data товару, який лишився відкладеним через капчу (статус 5)."""
+    return {
+        "product_id": product_id,
+        "status_id": 5,
+        "price": None,
+        "order_quantity": None,
+        "rating": None,
+    }
+
+
+def _plan_batch(
+    count: int, concurrency: int, time_budget: float, shard_size: int = None
+) -> int:
+    """
+    Скільки товарів брати в пакет: не більше shard_size і не більше, ніж
+    встигне оброблятися за time_budget за оцінкою з недавніх вимірів часу товару.
+    """
+    if shard_size:
+        count = min(count, max(1, int(shard_size)))
+    samples = metrics.REGISTRY.samples("product_seconds")
+    if time_budget and len(samples) >= BUDGET_MIN_SAMPLES:
+        # Товари обробляються паралельно, тож на один товар припадає час / concurrency
+        per_product = sum(samples) / len(samples) / concurrency
+        if per_product > 0:
+            count = min(count, max(1, int(time_budget / per_product)))
+    return count
+
+
+def iter_product_data(
+    products_to_scrape: list,
+    http_first: bool = HTTP_FIRST,
+    concurrency: int = CONCURRENCY,
+    request_interval: float = REQUEST_INTERVAL,
+    resume_from: int = 0,
+    use_cache: bool = PAGE_CACHE,
+    captcha_mode: str = CAPTCHA_MODE,
+    archive_pages: bool = PAGE_ARCHIVE,
+    time_budget: float = TIME_BUDGET,
+    shard_size: int = None,
+):
+    """
+    Генератор, що по черзі повертає daily_data для кожного товару в порядку списку.
+    Сторінки спершу завантажуються через HTTP, а браузер з пулу воркера
+    береться лише тоді, коли сторінка його потребує. Товари обробляються
+    паралельно в concurrency потоках. resume_from - скільки товарів уже
+    оброблено в попередньому запуску (їх буде пропущено). use_cache -
+    умовні запити з локальним кешем сторінок (лише для HTTP-шляху).
+    archive_pages - зберігати знімки сторінок в архів для повторного розбору.
+
+    Товари з капчею не зупиняють пакет: вони відкладаються, а в режимі
+    captcha_mode="manual" обробляються після решти з ручним проходженням капчі
+    (результати після першого відкладеного товару притримуються, щоб зберегти порядок).
+    Якщо капчу ніхто не пройшов, відкладені товари повертаються зі статусом 5.
+
+    time_budget - скільки секунд може тривати пакет, shard_size - підказка сервера,
+    скільки товарів обробити за раз. Якщо оброблено не весь список, генератор
+    повертає (return) параметри продовження: {"products_to_scrape": залишок}.
+    """
+    products = [
+        product
+        for product in products_to_scrape
+        if product.get("product_id") and product.get("url")
+    ][resume_from:]
+    concurrency = max(1, min(int(concurrency), len(products) or 1))
+    deadline = time.monotonic() + time_budget if time_budget else None
+    batch_size = _plan_batch(len(products), concurrency, time_budget, shard_size)
+    batch, remainder = products[:batch_size], products[batch_size:]
+
+    session = (
+        create_http_session(max(HTTP_POOL_SIZE, concurrency)) if http_first else None
+    )
+    limiter = AdaptiveRateLimiter(
+        request_interval, REQUEST_INTERVAL_MIN, REQUEST_INTERVAL_MAX
+    )
+    cache = get_page_cache() if session and use_cache else None
+    cache_stats = cache.snapshot() if cache else None
+    archive = get_page_archive() if archive_pages else None
+    # product_id товарів, які зустріли капчу і були відкладені
+    deferred = []
+    # Ручне проходження капчі не вдалося - інші відкладені товари вже не пробуємо
+    manual_failed = threading.Event()
+
+    # Беремо теплі браузери з пулу воркера, а без нього - створюємо тимчасовий пул
+    pool = get_browser_pool()
+    own_pool = None
+    if pool is None:
+        pool = own_pool = BrowserPool(size=concurrency)
+
+    def scrape_product(product: dict, solve_captcha: bool = False) -> dict | None:
+        """Повертає daily_data або None, якщо товар відкладено через капчу."""
+        with metrics.timer("product_seconds"):
+            return _scrape_product(product, solve_captcha)
+
+    def _scrape_product(product: dict, solve_captcha: bool) -> dict | None:
+        product_id = product.get("product_id")
+        product_url = product.get("url")
+
+        fields = None
+        if session:
+            limiter.wait(product_url)
+            fields = fetch_page_fields(
+                session, product_url, cache, limiter, archive, product_id
+            )
+
+        if fields is None:
+            metrics.inc("products_browser_total")
+            with pool.borrow() as lease:
+                limiter.wait(product_url)
+                fields = _scrape_with_browser(lease, product_url, solve_captcha)
+                limiter.record(product_url, throttled=fields["captcha"])
+                if archive:
+                    _archive_browser_page(
+                        archive, lease.driver, product_url, product_id
                     )
-                    daily_data["price"] = float(
-                        price_element.get_attribute("data-qaprice")
-                    )
-                except (NoSuchElementException, TypeError, ValueError):
-                    pass
-
-                # Парсимо кількість замовлень
-                try:
-                    orders_text = main_info_block.find_element(
-                        By.CSS_SELECTOR, ORDER_COUNTER_SELECTOR
-                    ).text
-                    daily_data["order_quantity"] = _extract_number(orders_text)
-                except NoSuchElementException:
-                    pass
-            except NoSuchElementException:
-                pass
-
-            # Парсимо рейтинг
-            try:
-                rating_element = driver.find_element(By.CSS_SELECTOR, RATING_SELECTOR)
-                daily_data["rating"] = float(
-                    rating_element.get_attribute("data-qarating")
-                )
-            except (NoSuchElementException, TypeError, ValueError):
-                pass
-
-            if daily_data.get("status_id") is None:
-                daily_data["status_id"] = 5
-
-            scraped_data.append(daily_data)
-            time.sleep(1)
-
+                if session:
+                    _sync_cookies(lease.driver, session)
+
+        metrics.inc("products_total")
+        if fields["captcha"]:
+            metrics.inc("captcha_total")
+        if fields["captcha"] and not solve_captcha:
+            deferred.append(product_id)
+            if captcha_mode == "manual":
+                return None
+        elif fields["captcha"]:
+            manual_failed.set()
+        return _build_daily_data(product_id, fields)
+
+    executor = None
+    try:
+        if concurrency == 1:
+            results = map(metrics.bind(scrape_product), batch)
+        else:
+            executor = ThreadPoolExecutor(
+                max_workers=concurrency, thread_name_prefix="prom_pars"
+            )
+            # map зберігає початковий порядок товарів
+            results = executor.map(metrics.bind(scrape_product), batch)
+
+        held = []
+        done = len(batch)
+        for index, (product, daily_data) in enumerate(zip(batch, results)):
+            if daily_data is None or held:
+                held.append((product, daily_data))
+            else:
+                yield daily_data
+            if deadline is not None and time.monotonic() > deadline:
+                done = index + 1
+                break
+
+        if held and deadline is not None and time.monotonic() > deadline:
+            # На ручну капчу часу не лишилося: товари від першого відкладеного
+            # (разом з уже обробленими після нього) переходять у продовження
+            done -= len(held)
+            held = []
+        # Відкладені товари: капча проходиться вручну, решта сторінок - вже з новою сесією.
+        # Якщо ручне проходження не вдалося, решта відкладених товарів повертається
+        # зі статусом 5 без нових спроб, а вже готові результати - як є
+        for product, daily_data in held:
+            if daily_data is None:
+                daily_data = _deferred_daily_data(product.get("product_id"))
+                if not manual_failed.is_set():
+                    try:
+                        daily_data = scrape_product(product, solve_captcha=True)
+                    except Exception as e:
+                        print(f"Ручне проходження капчі не вдалося: {e}")
+                        manual_failed.set()
+            yield daily_data
+
+        # Пакет обрізано за shard_size, якщо його не перервав дедлайн
+        # і саме shard_size обмежив його розмір під час планування
+        by_shard = (
+            done == len(batch)
+            and shard_size
+            and len(batch) == min(len(products), max(1, int(shard_size)))
+        )
+        remainder = batch[done:] + remainder
+        if remainder:
+            metrics.inc("products_continued_total", len(remainder))
+            reason = "Розмір пакета (shard_size)" if by_shard else "Часовий бюджет"
+            print(
+                f"{reason}: оброблено {len(products) - len(remainder)} з "
+                f"{len(products)} товарів, залишок повертається серверу."
+            )
+            return {"products_to_scrape": remainder}
+    finally:
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        # Закриваємо тимчасовий пул і HTTP-сесію (браузери пулу воркера лишаються теплими)
+        if own_pool:
+            own_pool.close()
+        if session:
+            session.close()
+        if deferred or limiter.throttle_events:
+            print(
+                f"Капча/обмеження: відкладено {len(deferred)} товарів, "
+                f"частоту запитів знижено {limiter.throttle_events} раз(и)."
+            )
+        if cache:
+            stats = cache.snapshot()
+            served = stats["not_modified"] - cache_stats["not_modified"]
+            unchanged = stats["unchanged"] - cache_stats["unchanged"]
+            print(
+                f"Кеш сторінок: {served} з {len(products)} товарів без завантаження (304), "
+                f"{unchanged} завантажено, але без змін."
+            )
+
+
+def parse_product_data(
+    products_to_scrape: list,
+    http_first: bool = HTTP_FIRST,
+    concurrency: int = CONCURRENCY,
+    request_interval: float = REQUEST_INTERVAL,
+    captcha_mode: str = CAPTCHA_MODE,
+) -> str:
+    """Основна функція для парсингу списку товарів: збирає весь результат iter_product_data."""
+    try:
+        scraped_data = list(
+            iter_product_data(
+                products_to_scrape,
+                http_first,
+                concurrency,
+                request_interval,
+                captcha_mode=captcha_mode,
+            )
+        )
         return {"status": "success", "data": scraped_data}
 
     except Exception as e:
         return {"status": "failure", "message": f"Критична помилка: {str(e)}"}
-    finally:
-        # Закриваємо браузер
-        if driver:
-            driver.quit()
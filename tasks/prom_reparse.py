@@ -0,0 +1,89 @@
+"""
+Повторно розбирає сторінки товарів з архіву (tasks/page_archive.py) поточною
+логікою extract_page_fields - без мережі і браузера. Після виправлення
+селекторів це замінює повторний збір усіх зачеплених товарів.
+
+    python -m tasks.prom_reparse --archive <папка воркера>/page_archive.db
+                                 [--since 2026-10-01] [--until 2026-10-18]
+                                 [--jobs 4] [--output data.json]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from tasks.page_archive import PageArchive
+from tasks.prom_parser import _build_daily_data, extract_page_fields
+
+# Скільки сторінок передавати процесу розбору за раз
+REPARSE_CHUNK = 64
+
+
+def _reparse(item: tuple) -> dict:
+    url, product_id, captured_at, html = item
+    daily_data = _build_daily_data(product_id, extract_page_fields(html))
+    return dict(daily_data, url=url, captured_at=round(captured_at))
+
+
+def reparse_archive(
+    archive: PageArchive, since: float = None, until: float = None, jobs: int = 1
+) -> list:
+    """daily_data для останнього знімка кожного URL за проміжок [since, until]."""
+    pages = archive.latest(since, until)
+    if jobs <= 1:
+        return [_reparse(item) for item in pages]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_reparse, pages, chunksize=REPARSE_CHUNK))
+
+
+def _timestamp(day: str | None, end_of_day: bool = False) -> float | None:
+    if not day:
+        return None
+    value = datetime.strptime(day, "%Y-%m-%d").timestamp()
+    return value + 24 * 3600 - 1 if end_of_day else value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    # Шлях обов'язковий: з "python -m" sys.executable - це інтерпретатор,
+    # а не worker.exe, тож archive_path() вказав би не на ту папку
+    parser.add_argument(
+        "--archive", required=True, help="page_archive.db з папки worker.exe"
+    )
+    parser.add_argument("--since", help="з дати (РРРР-ММ-ДД)")
+    parser.add_argument("--until", help="по дату включно (РРРР-ММ-ДД)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="зберегти daily_data у JSON-файл")
+    args = parser.parse_args()
+
+    archive = PageArchive(args.archive)
+    started = time.perf_counter()
+    data = reparse_archive(
+        archive,
+        _timestamp(args.since),
+        _timestamp(args.until, end_of_day=True),
+        args.jobs,
+    )
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for item in data:
+        statuses[item["status_id"]] = statuses.get(item["status_id"], 0) + 1
+    summary = {
+        "pages": len(data),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(len(data) / elapsed, 1) if elapsed else None,
+        "status_counts": {
+            str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))
+        },
+        "archive": archive.stats(),
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
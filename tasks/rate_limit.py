@@ -0,0 +1,109 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class HostRateLimiter:
+    """
+    Спільний для всіх потоків обмежувач частоти запитів до кожного хоста.
+    Кожен запит резервує наступний вільний слот часу для свого хоста,
+    тому паралельні потоки разом не перевищують 1 / min_interval запитів на секунду.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def _interval(self, host: str) -> float:
+        return self.min_interval
+
+    def wait(self, url: str):
+        """Блокує потік, доки не настане його черга звернутися до хоста з url."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self._interval(host)
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class AdaptiveRateLimiter(HostRateLimiter):
+    """
+    Обмежувач, що сам підбирає частоту запитів до кожного хоста (AIMD):
+    після кожної успішної відповіді частота зростає на increase запитів/с,
+    а після капчі, 429/503 або підозріло повільної відповіді - множиться на decrease.
+    Зменшення відбувається не частіше, ніж раз на cooldown секунд, щоб одна
+    хвиля відмов від паралельних потоків не обвалила частоту до мінімуму.
+    """
+
+    def __init__(
+        self,
+        initial_interval: float,
+        min_interval: float,
+        max_interval: float,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+        slow_factor: float = 3.0,
+        cooldown: float = 5.0,
+    ):
+        super().__init__(initial_interval)
+        self.min_rate = 1 / max(max_interval, 1e-3)
+        self.max_rate = 1 / max(min(min_interval, initial_interval), 1e-3)
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_factor = slow_factor
+        self.cooldown = cooldown
+        self._rate = {}
+        self._latency = {}
+        self._last_decrease = {}
+        self.throttle_events = 0
+
+    def _host_rate(self, host: str) -> float:
+        return self._rate.setdefault(
+            host, 1 / max(self.min_interval, 1 / self.max_rate)
+        )
+
+    def _interval(self, host: str) -> float:
+        return 1 / self._host_rate(host)
+
+    def rate(self, url: str) -> float:
+        """Поточна частота запитів до хоста з url (запитів/с)."""
+        with self._lock:
+            return self._host_rate(urlsplit(url).netloc)
+
+    def record(self, url: str, throttled: bool, elapsed: float = None):
+        """
+        Зворотний зв'язок після запиту. throttled - сайт обмежує нас (капча, 429, 503).
+        elapsed - час відповіді; порівнюється з середнім для хоста (лише для однотипних запитів).
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            rate = self._host_rate(host)
+            latency = self._latency.get(host)
+            slow = (
+                elapsed is not None
+                and latency is not None
+                and elapsed > self.slow_factor * latency
+            )
+            if elapsed is not None and not throttled:
+                self._latency[host] = (
+                    elapsed if latency is None else 0.8 * latency + 0.2 * elapsed
+                )
+
+            if throttled or slow:
+                if now - self._last_decrease.get(host, float("-inf")) < self.cooldown:
+                    return
+                self._last_decrease[host] = now
+                self.throttle_events += 1
+                rate = max(self.min_rate, rate * self.decrease)
+                # Нова пауза діє одразу, а не після вже зарезервованих слотів
+                self._next_slot[host] = max(
+                    self._next_slot.get(host, now), now + 1 / rate
+                )
+            else:
+                rate = min(self.max_rate, rate + self.increase)
+            self._rate[host] = rate